@@ -1,44 +1,38 @@
 import streamlit as st
 import pandas as pd
-from textblob import TextBlob
-from nltk.tokenize import word_tokenize, sent_tokenize
-from nltk.stem import WordNetLemmatizer, PorterStemmer
-from nltk import pos_tag
 from collections import Counter
-from bs4 import BeautifulSoup
-import requests
-import nltk
-import os
-import matplotlib.pyplot as plt
-import seaborn as sns
+from sentiment import label_polarity
+from charts import show_chart
+from docstore import store_upload
+from document import get_csv_columns, get_document, get_document_from_csv, get_document_from_file
+from resources import get_stopwords
 
 
-# Explicitly set the NLTK data path to where the downloaded resources are located
-nltk_data_path = os.path.expanduser('~') + '/nltk_data'
-nltk.data.path.append(nltk_data_path)
-
-
-# Ensure necessary packages are downloaded
-nltk.download('tagsets_json')
-nltk.download('averaged_perceptron_tagger_eng') 
-nltk.download('punkt_tab')
-nltk.download('punkt', download_dir=nltk_data_path)
-nltk.download('wordnet', download_dir=nltk_data_path)
-nltk.download('averaged_perceptron_tagger', download_dir=nltk_data_path)
-nltk.download('stopwords', download_dir=nltk_data_path)
+# NLTK data is looked up (and fetched if missing) on first use, see resources.py
 
 # Page Configuration
 st.set_page_config(page_title="AI Text Mining & Web Scraping", layout="centered")
 
 # Function to process text from .txt file or .csv file
 def load_file(file):
-    if file.name.endswith(".txt"):
-        return file.read().decode("utf-8")
-    elif file.name.endswith(".csv"):
-        df = pd.read_csv(file)
-        # Combine all text columns into one for processing
-        text = df.apply(lambda row: ' '.join(row.values.astype(str)), axis=1)
-        return ' '.join(text)
+    name = file.name
+    # Sessions share one stored copy of the same upload and keep a handle to it
+    file = store_upload(st.session_state, file)
+    if name.endswith(".txt"):
+        # Text files are decoded in chunks on demand rather than read into one string
+        return get_document_from_file(file)
+    elif name.endswith(".csv"):
+        # Only the text columns are analysed; the file is read in blocks by pyarrow
+        columns = get_csv_columns(file)
+        text_columns = st.multiselect(
+            "Columns to analyse",
+            [name for name, _ in columns],
+            default=[name for name, is_text in columns if is_text],
+        )
+        if not text_columns:
+            st.warning("Choose at least one column to analyse.")
+            return None
+        return get_document_from_csv(file, text_columns)
     else:
         st.error("Unsupported file format!")
         return None
@@ -113,32 +107,29 @@ def process_file_page():
 # Tokenization Function
 def perform_tokenization(text):
     st.subheader("Tokenization Result")
-    tokens = word_tokenize(text)
+    tokens = get_document(text).tokens
     st.write("Tokens:")
     st.write(tokens)
 
 # POS Tagging Function
 def perform_pos_tagging(text):
     st.subheader("POS Tagging Result")
-    tokens = word_tokenize(text)
-    pos_tags = pos_tag(tokens)
+    pos_tags = get_document(text).pos_tags
     st.write("POS Tags:")
     st.write(pos_tags)
 
 # Lemmatization Function
 def perform_lemmatization(text):
     st.subheader("Lemmatization Result")
-    lemmatizer = WordNetLemmatizer()
-    tokens = word_tokenize(text)
-    lemmatized_tokens = [lemmatizer.lemmatize(token) for token in tokens]
+    lemmatized_tokens = get_document(text).lemmas.tolist()
     st.write("Lemmatized Tokens:")
     st.write(lemmatized_tokens)
 
 # Stopword Removal Function
 def perform_stopword_removal(text):
     st.subheader("Stopword Removal Result")
-    stop_words = set(nltk.corpus.stopwords.words("english"))
-    tokens = word_tokenize(text)
+    stop_words = get_stopwords("english")
+    tokens = get_document(text).tokens
     filtered_tokens = [w for w in tokens if w.lower() not in stop_words]
     st.write("Filtered Tokens:")
     st.write(filtered_tokens)
@@ -146,16 +137,14 @@ def perform_stopword_removal(text):
 # Stemming Function
 def perform_stemming(text):
     st.subheader("Stemming Result")
-    ps = PorterStemmer()
-    tokens = word_tokenize(text)
-    stemmed_words = [ps.stem(w) for w in tokens]
+    stemmed_words = get_document(text).stems.tolist()
     st.write("Stemmed Words:")
     st.write(stemmed_words)
 
 # Word Frequency Function
 def perform_word_frequency(text):
     st.subheader("Word Frequency Result")
-    tokens = word_tokenize(text)
+    tokens = get_document(text).tokens
     word_freq = Counter(tokens)
     st.write("Word Frequency:")
     st.write(word_freq)
@@ -164,32 +153,16 @@ def perform_word_frequency(text):
 def perform_sentiment_analysis(text):
     st.subheader("Sentiment Analysis Result")
     
-    # Ensure the text is a string and tokenize into sentences
-    if isinstance(text, bytes):
-        text = text.decode("utf-8")  # If file was read as bytes, decode it to string
-    
-    sentences = sent_tokenize(text)  # Use NLTK's sent_tokenize to split into sentences
-    
+    # Sentences are split once per document and scored together in one batch
+    document = get_document(text)
+    sentiment_df = pd.DataFrame({"Sentence": document.sentences, "Polarity": document.polarity})
+    sentiment_df["Sentiment"] = label_polarity(sentiment_df["Polarity"].to_numpy())
+
     # Sentiment counters
-    positive = 0
-    negative = 0
-    neutral = 0
-    
-    sentiment_labels = []
-    
-    # Analyze sentiment for each sentence
-    for sentence in sentences:
-        blob = TextBlob(sentence)  # Process each sentence individually
-        sentiment = blob.sentiment.polarity
-        if sentiment > 0:
-            positive += 1
-            sentiment_labels.append("Positive")
-        elif sentiment < 0:
-            negative += 1
-            sentiment_labels.append("Negative")
-        else:
-            neutral += 1
-            sentiment_labels.append("Neutral")
+    counts = sentiment_df["Sentiment"].value_counts()
+    positive = int(counts.get("Positive", 0))
+    negative = int(counts.get("Negative", 0))
+    neutral = int(counts.get("Neutral", 0))
     
     # Display sentiment counts
     st.write(f"Positive Sentences: {positive}")
@@ -201,16 +174,10 @@ def perform_sentiment_analysis(text):
     sizes = [positive, negative, neutral]
     colors = ['#4CAF50', '#F44336', '#FFC107']
     
-    fig, ax = plt.subplots()
-    ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-    ax.axis('equal')  # Equal aspect ratio ensures that the pie is drawn as a circle.
-    st.pyplot(fig)
-    
-    # Countplot for sentiment categories
-    fig, ax = plt.subplots()
-    sns.countplot(x=sentiment_labels, palette=colors, ax=ax)
-    ax.set_title('Count of Sentiment Categories')
-    st.pyplot(fig)
+    show_chart("pie", labels, sizes, colors=colors)
+
+    # Count of each sentiment category, drawn from the same counters
+    show_chart("bar", labels, sizes, colors=colors, title="Count of Sentiment Categories")
     
     # Word Count Plot
     # tokens = word_tokenize(text)
@@ -236,20 +203,18 @@ def perform_web_scraping():
     # Button to trigger scraping
     if st.button("Scrape"):
         if url:
+            # p1 imports lxml and sets up the shared session and page cache, so it is loaded on first use
+            from p1 import get_scraped_content
             try:
-                response = requests.get(url)
-                if response.status_code == 200:
-                    soup = BeautifulSoup(response.content, 'html.parser')
+                # Fetched with the shared session's timeout and retries, revalidating the cached copy
+                page_title, paragraphs = get_scraped_content(url)
+                if paragraphs is not None:
                     st.write("Web page content scraped successfully!")
                     
-                    # Extract and display the title and all paragraphs
-                    page_title = soup.title.string if soup.title else "No title found"
+                    # Display the title and all paragraphs
                     st.write(f"### Page Title: {page_title}")
-                    
-                    # Extract paragraphs
-                    paragraphs = soup.find_all('p')
-                    for p in paragraphs:
-                        st.write(p.get_text())
+                    for paragraph in paragraphs:
+                        st.write(paragraph)
                         
                 else:
                     st.error("Failed to retrieve the web page.")
@@ -0,0 +1,109 @@
+from itertools import repeat
+import pandas as pd
+from frequency import count_tokens, top_k
+from pool import MAX_WORKERS, pool_map, split_batches
+from resources import get_sentence_tokenizer
+from tokenizer import DEFAULT_TOKENIZER, get_word_tokenizer
+
+# Number of most frequent terms listed for each document
+TOP_TERMS = 5
+
+# Columns added to each row by analyse_rows(), in order
+RESULT_COLUMNS = ["Text", "Sentences", "Tokens", "Top Terms", "Polarity", "Sentiment"]
+
+# Periods dates can be grouped into by aggregate_rows()
+DATE_PERIODS = {"Day": "D", "Week": "W", "Month": "M", "Year": "Y"}
+
+
+# Function to read a review-style CSV upload into a DataFrame with pyarrow
+def read_rows(file):
+    if hasattr(file, "getbuffer"):
+        # Uploads and stored documents are parsed from their buffer without a copy
+        import pyarrow as pa
+        file = pa.BufferReader(pa.py_buffer(file.getbuffer()))
+    elif hasattr(file, "seek"):
+        file.seek(0)
+    return pd.read_csv(file, engine="pyarrow")
+
+
+# Function to join the chosen text columns of every row into one document per row
+def row_texts(df, text_columns):
+    columns = [df[column].fillna("").astype(str) for column in text_columns]
+    if not columns:
+        return pd.Series("", index=df.index)
+    return columns[0].str.cat(columns[1:], sep=" ") if len(columns) > 1 else columns[0]
+
+
+def _analyse_batch(texts, lowercase, stop_words, top, tokenizer=DEFAULT_TOKENIZER):
+    from sentiment import score_sentences
+    sentence_tokenizer = get_sentence_tokenizer()
+    tokenize = get_word_tokenizer(tokenizer)
+    sentence_counts, token_counts, top_terms = [], [], []
+    for text in texts:
+        sentences = sentence_tokenizer.tokenize(text)
+        tokens = [token for sentence in sentences for token in tokenize(sentence)]
+        # Punctuation is counted as a token but never listed as a term
+        words = count_tokens((token for token in tokens if any(c.isalnum() for c in token)), lowercase, stop_words)
+        sentence_counts.append(len(sentences))
+        token_counts.append(len(tokens))
+        top_terms.append(", ".join(word for word, _ in top_k(words, top)))
+    # Each document is scored as a whole, as TextBlob(text).sentiment.polarity
+    polarity = score_sentences(texts).tolist()
+    return sentence_counts, token_counts, top_terms, polarity
+
+
+# Function to analyse every document of a list separately, optionally across the shared process pool.
+# Returns the results as columns: sentences, tokens, top terms and polarity per document.
+def analyse_documents(texts, workers=1, lowercase=True, stop_words=None, top=TOP_TERMS, tokenizer=DEFAULT_TOKENIZER):
+    texts = list(texts)
+    workers = max(1, min(workers, MAX_WORKERS))
+    if workers == 1 or len(texts) < workers:
+        batches = [_analyse_batch(texts, lowercase, stop_words, top, tokenizer)]
+    else:
+        # pool_map() returns the batches in submission order, so the columns line up with the rows
+        batches = pool_map(
+            _analyse_batch, split_batches(texts, workers), repeat(lowercase), repeat(stop_words), repeat(top),
+            repeat(tokenizer), workers=workers,
+        )
+    columns = ([], [], [], [])
+    for batch in batches:
+        for column, values in zip(columns, batch):
+            column.extend(values)
+    return columns
+
+
+# Function to run the per-document analyses over the rows of a DataFrame and add the results as new columns
+def analyse_rows(df, text_columns, workers=1, lowercase=True, stop_words=None, top=TOP_TERMS,
+                 tokenizer=DEFAULT_TOKENIZER):
+    from sentiment import label_polarity
+    texts = row_texts(df, text_columns)
+    sentences, tokens, terms, polarity = analyse_documents(texts, workers, lowercase, stop_words, top, tokenizer)
+    result = df.copy()
+    result["Text"] = texts
+    result["Sentences"] = pd.Series(sentences, index=df.index, dtype="int64")
+    result["Tokens"] = pd.Series(tokens, index=df.index, dtype="int64")
+    result["Top Terms"] = pd.Series(terms, index=df.index, dtype="string")
+    result["Polarity"] = pd.Series(polarity, index=df.index, dtype="float64")
+    result["Sentiment"] = pd.Categorical(
+        label_polarity(result["Polarity"].to_numpy()), categories=["Positive", "Negative", "Neutral"]
+    )
+    return result
+
+
+# Function to summarise per-document results by a column, e.g. the rating.
+# With `date_freq` ("D", "W", "M", "Y") the column is parsed as dates and grouped into periods.
+def aggregate_rows(results, by, date_freq=None, dayfirst=True):
+    key = results[by]
+    if date_freq:
+        key = pd.to_datetime(key, dayfirst=dayfirst, errors="coerce").dt.to_period(date_freq)
+    grouped = results.groupby(key, observed=True, sort=True)
+    summary = grouped.agg(
+        Documents=("Polarity", "size"),
+        Mean_Polarity=("Polarity", "mean"),
+        Mean_Tokens=("Tokens", "mean"),
+    )
+    # Share of each sentiment label within the group
+    shares = pd.crosstab(key, results["Sentiment"], normalize="index")
+    summary = summary.join(shares.add_suffix(" %").mul(100).round(1))
+    summary.index = summary.index.astype(str)
+    return summary.rename(columns=lambda column: column.replace("_", " ")).reset_index()
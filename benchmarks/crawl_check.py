@@ -0,0 +1,158 @@
+"""Check the site crawler against a local fixture site.
+
+A small site is generated in a temporary directory and served on a free
+local port. It has articles, a paginated listing whose pages are
+near-duplicates of each other, a chain of pages deeper than the crawl
+depth, a directory robots.txt forbids, and links that must not be
+followed: another site, a PDF and fragments of pages already seen.
+
+Every check prints PASS or FAIL; the script exits with status 1 when one
+fails.
+
+    python benchmarks/crawl_check.py
+"""
+import argparse
+import functools
+import os
+import re
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from suite import _QuietHandler  # noqa: E402
+from http.server import ThreadingHTTPServer  # noqa: E402
+
+SOURCE_TEXT = os.path.join(ROOT, "uploaded_file.txt")
+
+ARTICLES = 5
+LISTING_PAGES = 4
+CHAIN_PAGES = 4
+
+
+class _RecordingHandler(_QuietHandler):
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests.append((time.monotonic(), self.path))
+        super().do_GET()
+
+
+def serve(directory):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_RecordingHandler, directory=directory))
+    server.lock = threading.Lock()
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def _page(title, paragraphs, links):
+    body = "".join(f"<p>{paragraph}</p>" for paragraph in paragraphs)
+    anchors = "".join(f'<a href="{href}">{href}</a> ' for href in links)
+    return f"<html><head><title>{title}</title></head><body><nav>{anchors}</nav>{body}</body></html>"
+
+
+# Function to write the fixture site; every article gets text of its own from the corpus
+def build_site(directory):
+    with open(SOURCE_TEXT, encoding="utf-8") as f:
+        lines = [sentence for sentence in re.split(r"(?<=[.!?])\s+", f.read()) if len(sentence.split()) > 8]
+    chunk = 12
+
+    def write(path, html):
+        path = os.path.join(directory, path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(html)
+
+    articles = [f"articles/{i}.html" for i in range(1, ARTICLES + 1)]
+    listings = [f"listing/page{i}.html" for i in range(1, LISTING_PAGES + 1)]
+    write("robots.txt", "User-agent: *\nDisallow: /private/\n")
+    write("index.html", _page("Home", lines[:chunk], [
+        *(f"/{path}" for path in articles), f"/{listings[0]}", "/chain/1.html",
+        "/private/secret.html", "http://example.org/elsewhere.html", "/files/report.pdf", "/#top",
+    ]))
+    for i, path in enumerate(articles, start=1):
+        # Relative links and a link back to the home page under another name
+        write(path, _page(f"Article {i}", lines[i * chunk:(i + 1) * chunk], ["../index.html", f"{(i % ARTICLES) + 1}.html#comments"]))
+    # The listing pages share their items and differ in one line, like paginated listings do
+    items = lines[(ARTICLES + 1) * chunk:(ARTICLES + 4) * chunk]
+    for i, path in enumerate(listings, start=1):
+        links = [f"page{j}.html" for j in range(1, LISTING_PAGES + 1) if j != i]
+        write(path, _page(f"Listing page {i}", items + [f"Page {i} of {LISTING_PAGES}"], links))
+    for i in range(1, CHAIN_PAGES + 1):
+        start = (ARTICLES + 4 + i) * chunk
+        write(f"chain/{i}.html", _page(f"Chain {i}", lines[start:start + chunk], [f"{i + 1}.html"]))
+    write("private/secret.html", _page("Secret", ["Nothing to see"], []))
+
+
+def _check(name, ok, detail=""):
+    print(f"{'PASS' if ok else 'FAIL'}  {name}{f'  ({detail})' if detail and not ok else ''}")
+    return ok
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.parse_args(argv)
+
+    import crawler
+    from p1 import create_session
+
+    results = []
+    with tempfile.TemporaryDirectory() as directory:
+        build_site(directory)
+        server = serve(directory)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            # A session of its own and no politeness delay, so the checks run quickly
+            pages = list(crawler.crawl(base + "/", max_depth=2, max_pages=100, delay=0, session=create_session()))
+            by_status = {}
+            for page in pages:
+                by_status.setdefault(page.status, set()).add(page.url[len(base):])
+            requested = [path for _, path in server.requests]
+
+            expected_ok = {"/", "/listing/page1.html", "/chain/1.html", "/chain/2.html"}
+            expected_ok |= {f"/articles/{i}.html" for i in range(1, ARTICLES + 1)}
+            results.append(_check("pages kept", by_status.get(crawler.OK) == expected_ok, by_status.get(crawler.OK)))
+            expected_duplicates = {f"/listing/page{i}.html" for i in range(2, LISTING_PAGES + 1)} | {"/index.html"}
+            results.append(_check(
+                "near-duplicates skipped", by_status.get(crawler.DUPLICATE) == expected_duplicates,
+                by_status.get(crawler.DUPLICATE),
+            ))
+            results.append(_check(
+                "duplicates have no paragraphs",
+                all(page.paragraphs is None for page in pages if page.status == crawler.DUPLICATE),
+            ))
+            results.append(_check(
+                "robots.txt respected",
+                by_status.get(crawler.BLOCKED) == {"/private/secret.html"}
+                and not any(path.startswith("/private/") for path in requested),
+                requested,
+            ))
+            results.append(_check("robots.txt fetched once", requested.count("/robots.txt") == 1, requested))
+            results.append(_check("every URL fetched once", len(requested) == len(set(requested)), requested))
+            results.append(_check(
+                "depth limit and skipped links",
+                not {"/chain/3.html", "/files/report.pdf"} & set(requested) and not by_status.get(crawler.FAILED),
+                requested,
+            ))
+
+            server.requests.clear()
+            pages = list(crawler.crawl(base + "/", max_depth=2, max_pages=3, delay=0, session=create_session()))
+            fetched = [path for _, path in server.requests if path != "/robots.txt"]
+            results.append(_check("page budget", len(fetched) == 3 and len(pages) == 3, fetched))
+
+            server.requests.clear()
+            delay = 0.2
+            list(crawler.crawl(base + "/", max_depth=1, max_pages=4, delay=delay, session=create_session()))
+            times = [at for at, path in server.requests if path != "/robots.txt"]
+            gaps = [later - earlier for earlier, later in zip(times, times[1:])]
+            results.append(_check("politeness delay", gaps and min(gaps) >= delay * 0.9, gaps))
+        finally:
+            server.shutdown()
+    return 0 if all(results) else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,141 @@
+"""Measure how long each page of main.py takes to import its modules.
+
+The imports a page runs are read from main.py itself: the module-level
+imports, plus the imports inside the ``if option == '<page>'`` branch.
+Each page is timed in fresh interpreters and the median is reported,
+together with the heavy libraries that ended up loaded.
+
+Pass ``--baseline <git revision>`` to measure that revision of the tree
+the same way and print the speedup of the working tree against it:
+
+    python benchmarks/import_time.py --baseline HEAD~1
+"""
+import argparse
+import ast
+import io
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tarfile
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Libraries whose presence in sys.modules is reported for each page
+HEAVY_MODULES = ["tkinter", "matplotlib", "seaborn", "textblob", "nltk", "pyarrow", "pandas", "lxml", "bs4"]
+
+# Run in a fresh interpreter: time the imports and list the heavy modules they loaded
+_PROBE = """
+import json, sys, time
+sys.path.insert(0, {root!r})
+start = time.perf_counter()
+exec(compile({code!r}, "main.py", "exec"))
+elapsed = time.perf_counter() - start
+loaded = [name for name in {heavy!r} if name in sys.modules]
+print(json.dumps({{"seconds": elapsed, "loaded": loaded}}))
+"""
+
+
+def _page_name(test):
+    # Matches `option == 'Page'`
+    if (isinstance(test, ast.Compare) and len(test.ops) == 1 and isinstance(test.ops[0], ast.Eq)
+            and isinstance(test.left, ast.Name) and test.left.id == "option"
+            and isinstance(test.comparators[0], ast.Constant)):
+        return test.comparators[0].value
+    return None
+
+
+def _imports(nodes):
+    found = []
+    for node in nodes:
+        for child in ast.walk(node):
+            if isinstance(child, (ast.Import, ast.ImportFrom)):
+                found.append(ast.unparse(child))
+    return found
+
+
+# Function to collect, for each page of main.py, the import statements it runs
+def page_imports(main_path):
+    with open(main_path, encoding="utf-8") as f:
+        tree = ast.parse(f.read())
+    top = [ast.unparse(node) for node in tree.body if isinstance(node, (ast.Import, ast.ImportFrom))]
+    pages = {}
+    for node in tree.body:
+        # Walk the if / elif chain on `option`
+        while isinstance(node, ast.If):
+            name = _page_name(node.test)
+            if name is not None:
+                pages[name] = top + _imports(node.body)
+            node = node.orelse[0] if len(node.orelse) == 1 else None
+    return pages
+
+
+def _measure(root, code, repeats):
+    runs = []
+    for _ in range(repeats):
+        probe = _PROBE.format(root=root, code=code, heavy=HEAVY_MODULES)
+        completed = subprocess.run(
+            [sys.executable, "-c", probe], cwd=root, capture_output=True, text=True
+        )
+        if completed.returncode != 0:
+            error = completed.stderr.strip().splitlines()
+            return {"error": error[-1] if error else "failed"}
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return {
+        "seconds": statistics.median(run["seconds"] for run in runs),
+        "loaded": runs[-1]["loaded"],
+    }
+
+
+# Function to time the imports of every page of the tree at `root`
+def measure_tree(root, repeats=5):
+    return {
+        page: _measure(root, "\n".join(imports), repeats)
+        for page, imports in page_imports(os.path.join(root, "main.py")).items()
+    }
+
+
+def _checkout(revision, directory):
+    archive = subprocess.run(["git", "archive", revision], cwd=ROOT, capture_output=True, check=True).stdout
+    with tarfile.open(fileobj=io.BytesIO(archive)) as tar:
+        tar.extractall(directory)
+
+
+def _format(result):
+    if "error" in result:
+        return f"error: {result['error']}"
+    return f"{result['seconds']:.3f}s  [{', '.join(result['loaded']) or '-'}]"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--baseline", help="git revision to compare the working tree against")
+    parser.add_argument("--repeats", type=int, default=5, help="fresh interpreters per page (default: 5)")
+    parser.add_argument("--json", action="store_true", help="print the results as JSON")
+    args = parser.parse_args(argv)
+
+    results = {"current": measure_tree(ROOT, args.repeats)}
+    if args.baseline:
+        with tempfile.TemporaryDirectory(prefix="cdac-import-baseline-") as directory:
+            _checkout(args.baseline, directory)
+            results["baseline"] = measure_tree(directory, args.repeats)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    baseline = results.get("baseline", {})
+    for page, current in results["current"].items():
+        print(f"{page}")
+        print(f"  current:  {_format(current)}")
+        if page in baseline:
+            before = baseline[page]
+            print(f"  baseline: {_format(before)}")
+            if "seconds" in before and "seconds" in current:
+                print(f"  speedup:  {before['seconds'] / current['seconds']:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
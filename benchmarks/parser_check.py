@@ -0,0 +1,110 @@
+"""Check that page extraction gives the title and paragraphs of parsing the whole page.
+
+The reference is the original extraction: the whole page parsed by
+BeautifulSoup with ``html.parser``, its ``<title>`` string and the text of
+every ``<p>``. Each engine of ``p1.parse_content`` is compared with it, with
+and without collecting links, on:
+
+* hand-written edge cases: block elements and lists inside paragraphs,
+  unclosed paragraphs, <textarea>, <script>, comments and entities;
+* random pages assembled from those pieces.
+
+The default engine must match on every input; the script exits with
+status 1 otherwise. Differences of the other engines are only reported.
+
+    python benchmarks/parser_check.py --fuzz 20000
+"""
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from bs4 import BeautifulSoup  # noqa: E402
+from p1 import PARSER_ENGINE, parse_content  # noqa: E402
+
+ENGINES = ("html.parser", "lxml")
+
+EDGE_CASES = [
+    "<html><head><title>T</title></head><body><p>one</p><p>two</p></body></html>",
+    "<p>text<div>block</div>more</p>",
+    "<p>a<ul><li>b</li></ul>c</p>",
+    "<p>one<p>two",
+    "<textarea><p>inside</p></textarea><p>after</p>",
+    "<p>with <a href='/x'>a link</a> and <b>bold</b></p><a href='y'>outside</a>",
+    "<p>script <script>var p = '<p>no</p>';</script> and <style>p {}</style> style</p>",
+    "<p>comment <!-- <p>hidden</p> --> entity &amp; &lt;p&gt; &nbsp;</p>",
+    "<title>First</title><title>Second</title><p>x</p>",
+    "<title></title><p></p>",
+    "<title>A <b>bold</b> title</title><p>x</p>",
+    "no markup at all",
+    "",
+    "<p>nested <p>inner</p> tail</p>",
+    "<table><tr><td><p>cell</td></tr></table><p>after",
+    "<P CLASS=x>Upper case</P><p>lower</p>",
+    "<p>br<br>line<br/>end</p>",
+    "<a><p>paragraph in a link</p></a>",
+]
+
+# Pieces the random pages are assembled from
+FUZZ_PIECES = [
+    "<p>", "</p>", "<div>", "</div>", "<ul>", "<li>", "</li>", "</ul>", "<span>", "</span>",
+    "<a href='/a'>", "<a href=\"b.html\">", "</a>", "<b>", "</b>", "<br>", "<title>", "</title>",
+    "<textarea>", "</textarea>", "<table><tr><td>", "</td></tr></table>", "<!-- c -->",
+    "&amp;", "&lt;", "&nbsp;", "text ", "more text ", "x", " ", "\n", "<h1>", "</h1>",
+    "<script>var s = '<p>';</script>", "<style>p {}</style>",
+]
+
+
+def reference(html):
+    soup = BeautifulSoup(html, "html.parser")
+    title = soup.title.string if soup.title else "No title"
+    return title, [p.get_text() for p in soup.find_all("p")]
+
+
+def fuzz_inputs(count, seed, max_pieces=40):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(FUZZ_PIECES) for _ in range(rng.randint(1, max_pieces)))
+
+
+# Function to compare an engine with the reference on some pages; returns the pages they disagree on
+def compare(engine, pages):
+    mismatches = []
+    for html in pages:
+        expected = reference(html)
+        for actual in (parse_content(html, engine), parse_content(html, engine, links=[])):
+            if actual != expected:
+                mismatches.append((html, expected, actual))
+                break
+    return mismatches
+
+
+def _report(name, count, mismatches, limit=3):
+    print(f"{name:<24} {count:>7,} pages  {len(mismatches):>6} mismatches")
+    for html, expected, actual in mismatches[:limit]:
+        print(f"  page:      {html[:160]!r}")
+        print(f"  reference: {expected!r:.160}")
+        print(f"  engine:    {actual!r:.160}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--fuzz", type=int, default=5000, help="random pages to compare (default: 5000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random pages")
+    args = parser.parse_args(argv)
+
+    failed = False
+    for engine in ENGINES:
+        for name, pages in (("edge cases", EDGE_CASES), ("fuzz", list(fuzz_inputs(args.fuzz, args.seed)))):
+            mismatches = compare(engine, pages)
+            default = " (default)" if engine == PARSER_ENGINE else ""
+            _report(f"{engine}{default} {name}", len(pages), mismatches)
+            failed = failed or bool(mismatches and engine == PARSER_ENGINE)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
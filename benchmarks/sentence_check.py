@@ -0,0 +1,107 @@
+"""Check that streamed sentence splitting gives exactly the sentences of the whole text.
+
+``DocumentAnalysis.iter_sentences`` splits a file block by block. It must
+give the same sentences as Punkt on the whole text, wherever the block
+boundaries land. The corpus (``uploaded_file.txt`` by default, or the text
+files given on the command line) is streamed at several block sizes, from
+the default down to a few hundred bytes, and compared sentence against
+sentence. Generated texts full of repeated end punctuation, quotes and
+abbreviations are compared too.
+
+Punkt's English model is used when it is installed. Without it, an
+untrained Punkt tokenizer and one trained on the corpus stand in for it.
+The script exits with status 1 when any run differs.
+
+    python benchmarks/sentence_check.py --block-sizes 262144 4096 300
+"""
+import argparse
+import os
+import random
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import document  # noqa: E402
+from ingest import BLOCK_SIZE, iter_text_chunks  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(ROOT, "uploaded_file.txt")
+DEFAULT_BLOCK_SIZES = [BLOCK_SIZE, 256 * 1024, 64 * 1024, 4096, 1024, 300]
+
+# Pieces the generated texts are made of
+FUZZ_PIECES = [
+    "Great", "Deal", "it works", "Mr.", "Dr. Smith", "U.S.", "e.g.", "etc.", "No.", "5", "3.5",
+    "!", "!!!!", "?!", "...", ".", ". ", "! ", "? ", '"', "'", ")", "(", " ", " ", "  ", "\n", "\n\n",
+]
+
+
+def get_splitters(corpus):
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+    from resources import get_sentence_tokenizer
+    try:
+        return {"punkt model": get_sentence_tokenizer()}
+    except LookupError:
+        return {"untrained": PunktSentenceTokenizer(), "corpus-trained": PunktSentenceTokenizer(corpus)}
+
+
+def fuzz_text(rng, pieces=4000):
+    return "".join(rng.choice(FUZZ_PIECES) + rng.choice(["", " "]) for _ in range(pieces))
+
+
+def stream_sentences(path, splitter, block_size):
+    document.get_sentence_tokenizer = lambda *args: splitter
+    analysis = document.DocumentAnalysis(lambda: iter_text_chunks(path, block_size), key=None)
+    return list(analysis.iter_sentences())
+
+
+# Function to find where two sentence lists first differ; None when they are equal
+def first_difference(expected, actual):
+    if expected == actual:
+        return None
+    for i, (a, b) in enumerate(zip(expected, actual)):
+        if a != b:
+            return i
+    return min(len(expected), len(actual))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", default=[DEFAULT_CORPUS], help="text files (default: uploaded_file.txt)")
+    parser.add_argument("--block-sizes", type=int, nargs="+", default=DEFAULT_BLOCK_SIZES, help="block sizes in bytes")
+    parser.add_argument("--fuzz", type=int, default=20, help="generated texts to compare (default: 20)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the generated texts")
+    args = parser.parse_args(argv)
+
+    import tempfile
+    rng = random.Random(args.seed)
+    with tempfile.TemporaryDirectory() as directory:
+        paths = list(args.corpus)
+        for i in range(args.fuzz):
+            path = os.path.join(directory, f"fuzz{i}.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write(fuzz_text(rng))
+            paths.append(path)
+        with open(args.corpus[0], encoding="utf-8") as f:
+            splitters = get_splitters(f.read())
+
+        failed = False
+        for name, splitter in splitters.items():
+            for path in paths:
+                with open(path, encoding="utf-8") as f:
+                    expected = splitter.tokenize(f.read())
+                for block_size in args.block_sizes:
+                    actual = stream_sentences(path, splitter, block_size)
+                    index = first_difference(expected, actual)
+                    if index is None:
+                        continue
+                    failed = True
+                    print(f"FAIL  {name}, {os.path.basename(path)}, {block_size:,}-byte blocks: "
+                          f"{len(actual):,} sentences instead of {len(expected):,}")
+                    print(f"  whole text: {expected[index:index + 2]!r}")
+                    print(f"  streamed:   {actual[index:index + 2]!r}")
+            print(f"{name:<15} {len(paths)} texts x {len(args.block_sizes)} block sizes  {'FAIL' if failed else 'ok'}")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
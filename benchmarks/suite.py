@@ -0,0 +1,298 @@
+"""Benchmark the text-mining and scraping hot paths and flag regressions.
+
+Synthetic corpora are built at multiples of ``uploaded_file.txt`` (1x, 10x
+and 100x by default) and served as local HTML pages for the scraping
+benchmarks. Every function is timed with cold caches and run once more
+under tracemalloc for its peak memory. Throughput is reported in tokens
+per second, counting whitespace-separated words of the input.
+
+Save the current numbers as the baseline for this machine with:
+
+    python benchmarks/suite.py --save-baseline
+
+Later runs compare against it and exit with status 1 when a benchmark is
+slower, or peaks higher in memory, than the baseline by more than the
+tolerance (20% by default), or fails where the baseline has a result.
+"""
+import argparse
+import functools
+import gc
+import html
+import json
+import logging
+import os
+import platform
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from http.server import SimpleHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Text the corpora are built from, and the sizes they are built at
+SOURCE_TEXT = os.path.join(ROOT, "uploaded_file.txt")
+DEFAULT_SCALES = [1, 10, 100]
+
+# Where baselines are stored; they only make sense on the machine that recorded them
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+
+# Relative slowdown (or memory growth) over the baseline that counts as a regression
+DEFAULT_TOLERANCE = 0.2
+
+# Characters of text per <p> element of the HTML fixtures
+PARAGRAPH_CHARS = 400
+
+
+# Function to write the corpus at each scale, as a text file and as an HTML page
+def build_fixtures(directory, scales):
+    with open(SOURCE_TEXT, encoding="utf-8") as f:
+        source = f.read()
+    paragraphs = [source[i:i + PARAGRAPH_CHARS] for i in range(0, len(source), PARAGRAPH_CHARS)]
+    body = "".join(f"<p>{html.escape(para)}</p>\n" for para in paragraphs)
+    fixtures = {}
+    for scale in scales:
+        text_path = os.path.join(directory, f"corpus_{scale}x.txt")
+        html_path = os.path.join(directory, f"page_{scale}x.html")
+        with open(text_path, "w", encoding="utf-8") as f:
+            for _ in range(scale):
+                f.write(source)
+                f.write("\n")
+        with open(html_path, "w", encoding="utf-8") as f:
+            f.write(f"<html><head><title>Benchmark page {scale}x</title></head><body>\n")
+            for _ in range(scale):
+                f.write(body)
+            f.write("</body></html>\n")
+        fixtures[scale] = {
+            "text": text_path,
+            "html": os.path.basename(html_path),
+            "tokens": len(source.split()) * scale,
+        }
+    return fixtures
+
+
+class _QuietHandler(SimpleHTTPRequestHandler):
+    def log_message(self, format, *args):
+        pass
+
+
+# Function to serve the fixture directory over HTTP on a free local port
+def serve(directory):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), functools.partial(_QuietHandler, directory=directory))
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+# Function to empty the process-wide caches, so every run measures a cold start
+def reset_caches():
+    import charts
+    import document
+    import segments
+    import sentiment
+    document._document_cache.clear()
+    document._lemma_memo.clear()
+    document._stem_memo.clear()
+    segments._segment_cache.clear()
+    sentiment._features.clear()
+    sentiment._token_parts.clear()
+    charts._chart_cache.clear()
+    gc.collect()
+
+
+def _bench_tokenization(fixture, base_url):
+    from document import get_document_from_file
+    from p2 import perform_tokenization
+    with open(fixture["text"], "rb") as f:
+        perform_tokenization(get_document_from_file(f))
+
+
+def _bench_pos_tagging(fixture, base_url):
+    from document import get_document_from_file
+    from p2 import perform_pos_tagging
+    with open(fixture["text"], "rb") as f:
+        perform_pos_tagging(get_document_from_file(f))
+
+
+def _bench_sentiment(fixture, base_url):
+    from document import get_document_from_file
+    from p2 import perform_sentiment_analysis
+    with open(fixture["text"], "rb") as f:
+        perform_sentiment_analysis(get_document_from_file(f))
+
+
+def _bench_scrape(fixture, base_url):
+    from p1 import create_session, get_scraped_content
+    # No HTTP cache and a new session, so the page is downloaded and parsed every time
+    get_scraped_content(f"{base_url}/{fixture['html']}", session=create_session(), cache=False)
+
+
+def _scrape_fixture(fixture, base_url):
+    from p1 import create_session, get_scraped_content
+    if "scraped" not in fixture:
+        fixture["scraped"] = get_scraped_content(f"{base_url}/{fixture['html']}", session=create_session(), cache=False)
+
+
+def _bench_excel(fixture, base_url):
+    from p1 import create_excel_file
+    title, paragraphs = fixture["scraped"]
+    create_excel_file(title, paragraphs)
+
+
+# The benchmarked functions, by the name results and baselines use
+BENCHMARKS = {
+    "perform_tokenization": _bench_tokenization,
+    "perform_pos_tagging": _bench_pos_tagging,
+    "perform_sentiment_analysis": _bench_sentiment,
+    "get_scraped_content": _bench_scrape,
+    "create_excel_file": _bench_excel,
+}
+
+# Work a benchmark needs done beforehand, outside of its measurements
+PREPARE = {
+    "create_excel_file": _scrape_fixture,
+}
+
+
+# Function to measure one benchmark: best wall time over `repeats` runs, then peak memory in one traced run
+def measure(bench, fixture, base_url, repeats=1, prepare=None):
+    if prepare is not None:
+        prepare(fixture, base_url)
+    times = []
+    for _ in range(repeats):
+        reset_caches()
+        start = time.perf_counter()
+        bench(fixture, base_url)
+        times.append(time.perf_counter() - start)
+    reset_caches()
+    tracemalloc.start()
+    try:
+        bench(fixture, base_url)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    seconds = min(times)
+    return {
+        "seconds": round(seconds, 4),
+        "peak_bytes": peak,
+        "tokens": fixture["tokens"],
+        "tokens_per_second": round(fixture["tokens"] / seconds) if seconds else None,
+    }
+
+
+def machine_info():
+    return {
+        "platform": platform.platform(),
+        "python": platform.python_version(),
+        "cpus": os.cpu_count(),
+    }
+
+
+# Function to compare results with a baseline and list the regressions beyond `tolerance`
+def find_regressions(results, baseline, tolerance=DEFAULT_TOLERANCE):
+    regressions = []
+    for key, result in results.items():
+        base = baseline.get(key)
+        if not base or "error" in base:
+            continue
+        # A benchmark that ran before and fails now is a regression too
+        if "error" in result:
+            regressions.append((key, "error", None, result["error"]))
+            continue
+        for metric in ("seconds", "peak_bytes"):
+            if base[metric] and result[metric] > base[metric] * (1 + tolerance):
+                regressions.append((key, metric, base[metric], result[metric]))
+    return regressions
+
+
+def _quiet_streamlit():
+    # The p2 functions draw Streamlit elements, which only log warnings outside a running app
+    os.environ.setdefault("STREAMLIT_LOGGER_LEVEL", "error")
+    import streamlit  # noqa: F401
+    for name in list(logging.root.manager.loggerDict):
+        if name.startswith("streamlit"):
+            logging.getLogger(name).setLevel(logging.ERROR)
+
+
+def _format_bytes(size):
+    return f"{size / (1024 * 1024):.1f} MB"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--scales", type=int, nargs="+", default=DEFAULT_SCALES,
+                        help="corpus sizes, as multiples of uploaded_file.txt (default: 1 10 100)")
+    parser.add_argument("--only", nargs="+", choices=list(BENCHMARKS), help="benchmarks to run (default: all)")
+    parser.add_argument("--repeats", type=int, default=1, help="timed runs per benchmark, the best is kept")
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="baseline file (default: benchmarks/baselines.json)")
+    parser.add_argument("--save-baseline", action="store_true", help="store these results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=DEFAULT_TOLERANCE,
+                        help="allowed slowdown or memory growth over the baseline (default: 0.2)")
+    parser.add_argument("--json", help="also write the results to this file")
+    args = parser.parse_args(argv)
+
+    _quiet_streamlit()
+    names = args.only or list(BENCHMARKS)
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="cdac-bench-") as directory:
+        fixtures = build_fixtures(directory, args.scales)
+        server = serve(directory)
+        base_url = f"http://127.0.0.1:{server.server_address[1]}"
+        try:
+            for scale in args.scales:
+                for name in names:
+                    key = f"{name}@{scale}x"
+                    try:
+                        result = measure(BENCHMARKS[name], fixtures[scale], base_url, args.repeats, PREPARE.get(name))
+                    except Exception as error:
+                        message = next((line.strip() for line in str(error).splitlines() if any(c.isalnum() for c in line)), "")
+                        result = {"error": f"{type(error).__name__}: {message}"}
+                    results[key] = result
+                    if "error" in result:
+                        print(f"{key:<36} error: {result['error']}", flush=True)
+                    else:
+                        print(f"{key:<36} {result['seconds']:>9.3f}s  {result['tokens_per_second']:>12,} tok/s"
+                              f"  peak {_format_bytes(result['peak_bytes']):>10}", flush=True)
+        finally:
+            server.shutdown()
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"machine": machine_info(), "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        baseline = {"machine": machine_info(), "results": {}}
+        if os.path.exists(args.baseline):
+            with open(args.baseline, encoding="utf-8") as f:
+                baseline = json.load(f)
+            baseline["machine"] = machine_info()
+        # Benchmarks that were not run keep their previous baseline
+        baseline["results"].update({key: result for key, result in results.items() if "error" not in result})
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print("No baseline yet; run with --save-baseline to record one.")
+        return 0
+    with open(args.baseline, encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get("machine") != machine_info():
+        print(f"Note: the baseline was recorded on another setup: {baseline.get('machine')}")
+    regressions = find_regressions(results, baseline["results"], args.tolerance)
+    for key, metric, before, after in regressions:
+        if metric == "error":
+            print(f"REGRESSION {key}: failed: {after}")
+        elif metric == "seconds":
+            print(f"REGRESSION {key}: {before:.3f}s -> {after:.3f}s")
+        else:
+            print(f"REGRESSION {key}: peak {_format_bytes(before)} -> {_format_bytes(after)}")
+    if not regressions:
+        print(f"No regressions beyond {args.tolerance:.0%} of the baseline.")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""Check that the fast tokenizer gives exactly the tokens of NLTK's word_tokenize.
+
+Three sets of inputs are compared, token list against token list:
+
+* every sentence (and every line) of the review corpus, ``uploaded_file.txt``
+  by default, or of the text files given on the command line;
+* hand-written edge cases around quotes, clitics, periods, commas and dashes;
+* random strings drawn from the characters the Treebank rules treat specially.
+
+Both tokenizers are also timed on the corpus sentences. The script exits with
+status 1 on the first run that finds a difference.
+
+    python benchmarks/tokenizer_check.py --fuzz 500000
+"""
+import argparse
+import os
+import random
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from nltk.tokenize import word_tokenize  # noqa: E402
+from tokenizer import fast_word_tokenize  # noqa: E402
+
+DEFAULT_CORPUS = os.path.join(ROOT, "uploaded_file.txt")
+
+EDGE_CASES = [
+    "Good muffins cost $3.88\nin New York.  Please buy me\ntwo of them.\nThanks.",
+    "They'll save and invest more.",
+    "hi, my name can't hello,",
+    'He said "it\'s fine." She didn\'t agree.',
+    '"Quoted at the start," then (quoted "inside") and “curly” ones.',
+    "I cannot believe it's not butter!!! Gonna buy more... wanna come?",
+    "Prices: 3,36 euros, 10:30 am, U.S. shipping, e.g. next week.",
+    "Well--I mean---it works -- mostly; 50% of the time & @support #fail",
+    "Great product.)",
+    "Ends with a quote.\"",
+    "Ends with ellipsis...",
+    "The dogs' bowls and 'single quotes' and rock 'n' roll",
+    "Don't, won't, shouldn't've, y'all'd, o'clock, 90's",
+    "Tabs\tand\nnewlines .\t]",
+    "[brackets] {braces} <angles> — em dash – en dash",
+    "",
+    "   ",
+    ".",
+    "''double apostrophes'' and ``backticks``",
+    "d'ye lemme gimme more'n gotta",
+]
+
+# Characters and pieces the random strings are made of
+FUZZ_ALPHABET = list("ab cdeS nN tT'l.L,:;!?()[]{}<>-–—$%&@#*«»“”‘’\"`\n\t0123456789_/+éü") + [
+    "n't", "'s", "'ll", "'RE", "...", "--", "''", "``", "cannot", "Gonna", "wanna ", "d'ye", " ", " ",
+]
+
+
+def corpus_inputs(paths):
+    from nltk.tokenize.punkt import PunktSentenceTokenizer
+    from resources import get_sentence_tokenizer
+    try:
+        splitter = get_sentence_tokenizer()
+    except LookupError:
+        # Without the Punkt model the sentences are cut by an untrained Punkt tokenizer, which is as good a test
+        splitter = PunktSentenceTokenizer()
+    sentences, lines = [], []
+    for path in paths:
+        with open(path, encoding="utf-8") as f:
+            text = f.read()
+        sentences.extend(splitter.tokenize(text))
+        lines.extend(text.splitlines())
+    return sentences, lines
+
+
+def fuzz_inputs(count, seed, max_pieces=25):
+    rng = random.Random(seed)
+    for _ in range(count):
+        yield "".join(rng.choice(FUZZ_ALPHABET) for _ in range(rng.randint(1, max_pieces)))
+
+
+# Function to compare both tokenizers on some inputs; returns the inputs they disagree on
+def compare(inputs):
+    mismatches = []
+    for text in inputs:
+        expected = word_tokenize(text, preserve_line=True)
+        actual = fast_word_tokenize(text)
+        if actual != expected:
+            mismatches.append((text, expected, actual))
+    return mismatches
+
+
+def _report(name, count, mismatches, limit=5):
+    print(f"{name:<12} {count:>9,} inputs  {len(mismatches):>5} mismatches")
+    for text, expected, actual in mismatches[:limit]:
+        print(f"  input:    {text[:200]!r}")
+        print(f"  treebank: {expected[:20]}")
+        print(f"  fast:     {actual[:20]}")
+
+
+def _time(tokenize, sentences):
+    start = time.perf_counter()
+    for sentence in sentences:
+        tokenize(sentence)
+    return time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("corpus", nargs="*", default=[DEFAULT_CORPUS], help="text files (default: uploaded_file.txt)")
+    parser.add_argument("--fuzz", type=int, default=100_000, help="random strings to compare (default: 100000)")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random strings")
+    args = parser.parse_args(argv)
+
+    sentences, lines = corpus_inputs(args.corpus)
+    failed = False
+    for name, inputs in (
+        ("sentences", sentences),
+        ("lines", lines),
+        ("edge cases", EDGE_CASES),
+        ("fuzz", list(fuzz_inputs(args.fuzz, args.seed))),
+    ):
+        mismatches = compare(inputs)
+        _report(name, len(inputs), mismatches)
+        failed = failed or bool(mismatches)
+
+    treebank = _time(lambda sentence: word_tokenize(sentence, preserve_line=True), sentences)
+    fast = _time(fast_word_tokenize, sentences)
+    print(f"treebank {treebank:.2f}s, fast {fast:.2f}s ({treebank / fast:.1f}x) on {len(sentences):,} sentences")
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
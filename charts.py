@@ -0,0 +1,115 @@
+import hashlib
+import io
+import threading
+from cachetools import LRUCache
+import streamlit as st
+from instrument import span
+
+# Bytes of rendered chart images kept in memory, shared by every Streamlit session
+CHART_CACHE_BYTES = 32 * 1024 * 1024
+
+# Image formats a chart can be rendered to, and their MIME types
+CHART_FORMATS = {"png": "image/png", "svg": "image/svg+xml"}
+
+_chart_cache = LRUCache(maxsize=CHART_CACHE_BYTES, getsizeof=len)
+_chart_cache_lock = threading.Lock()
+
+
+# Function to key a chart by its kind, data and options
+def chart_key(kind, labels, values, fmt, **options):
+    data = (
+        kind, fmt,
+        [str(label) for label in labels],
+        [float(value) for value in values],
+        sorted((name, repr(value)) for name, value in options.items()),
+    )
+    return hashlib.sha256(repr(data).encode("utf-8")).hexdigest()
+
+
+def _palette(name, count):
+    from matplotlib import colormaps
+    cmap = colormaps[name]
+    return [cmap(i % cmap.N) for i in range(count)]
+
+
+def _draw_pie(ax, labels, values, colors=None, palette="Set3"):
+    ax.pie(values, labels=labels, autopct="%1.1f%%", startangle=90,
+           colors=colors or _palette(palette, len(values)))
+    ax.axis("equal")  # Equal aspect ratio ensures that the pie is drawn as a circle.
+
+
+def _draw_bar(ax, labels, values, colors=None, palette="tab10", xlabel=None, ylabel=None, rotation=0):
+    ax.bar([str(label) for label in labels], values, color=colors or _palette(palette, len(values)))
+    ax.set_xlabel(xlabel or "")
+    ax.set_ylabel(ylabel or "")
+    ax.tick_params(axis="x", rotation=rotation)
+
+
+_DRAWERS = {"pie": _draw_pie, "bar": _draw_bar}
+
+
+# Function to render a chart to image bytes.
+# The figure is built without pyplot, so it is never registered globally, and it is always released.
+def render_chart(kind, labels, values, fmt="png", title=None, figsize=(8, 6), **options):
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    try:
+        ax = fig.add_subplot()
+        _DRAWERS[kind](ax, labels, values, **options)
+        if title:
+            ax.set_title(title)
+        fig.tight_layout()
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt)
+        return buffer.getvalue()
+    finally:
+        fig.clear()
+
+
+# Function to get the image bytes of a chart, rendering it only if the same chart is not cached
+def get_chart(kind, labels, values, fmt="png", **options):
+    labels, values = list(labels), list(values)
+    key = chart_key(kind, labels, values, fmt, **options)
+    with _chart_cache_lock:
+        image = _chart_cache.get(key)
+    if image is None:
+        with span("chart.render", kind=kind, fmt=fmt):
+            image = render_chart(kind, labels, values, fmt, **options)
+        with _chart_cache_lock:
+            _chart_cache[key] = image
+    return image
+
+
+def _show_native(kind, labels, values, title=None, **options):
+    import pandas as pd
+    data = pd.DataFrame({"label": [str(label) for label in labels], "value": list(values)})
+    # "sort": None keeps the order of the aggregates instead of sorting the labels
+    if kind == "pie":
+        spec = {
+            "mark": {"type": "arc", "tooltip": True},
+            "encoding": {
+                "theta": {"field": "value", "type": "quantitative"},
+                "color": {"field": "label", "type": "nominal", "sort": None},
+            },
+        }
+    else:
+        spec = {
+            "mark": {"type": "bar", "tooltip": True},
+            "encoding": {
+                "x": {"field": "label", "type": "nominal", "sort": None, "title": options.get("xlabel")},
+                "y": {"field": "value", "type": "quantitative", "title": options.get("ylabel")},
+            },
+        }
+    if title:
+        spec["title"] = title
+    st.vega_lite_chart(data, spec, use_container_width=True)
+
+
+# Function to show a chart of already aggregated data.
+# native=True draws an interactive Streamlit chart in the browser instead of a matplotlib image.
+def show_chart(kind, labels, values, native=False, **options):
+    with span("chart.show", kind=kind, native=native):
+        if native:
+            _show_native(kind, labels, values, **options)
+            return
+        st.image(get_chart(kind, labels, values, "png", **options))
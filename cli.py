@@ -0,0 +1,259 @@
+"""Run the text-mining analyses over many files without the Streamlit app.
+
+Each input file is analysed in a worker process and every analysis is
+written to its own Parquet or CSV file in the output directory. Finished
+(file, analysis) pairs are recorded in a manifest there, so running the
+same command again after an interruption only does the remaining work.
+
+    python cli.py reviews/ "corpus/*.txt" -a sentiment frequency -o results/
+"""
+import argparse
+import glob
+import hashlib
+import json
+import os
+import sys
+import time
+from export import EXPORT_FORMATS, write_export
+from ingest import csv_columns, iter_blocks, iter_csv_text_chunks, iter_text_chunks
+from pool import MAX_WORKERS, pool_completed
+from tokenizer import DEFAULT_TOKENIZER, TOKENIZERS
+
+# File types the pipeline reads
+INPUT_EXTENSIONS = (".txt", ".csv")
+
+# Name of the file in the output directory that records finished work
+MANIFEST_NAME = "manifest.jsonl"
+
+# Output formats offered on the command line
+OUTPUT_FORMATS = {"parquet": "Parquet", "csv": "CSV"}
+
+
+def _tokens_table(document, tokenizer):
+    document.tokenize(tokenizer)
+    return ["Tokens"], ((token,) for token in document.tokens)
+
+
+def _pos_table(document, tokenizer):
+    document.tokenize(tokenizer)
+    return ["Word", "POS"], document.pos_tags
+
+
+def _lemmas_table(document, tokenizer):
+    document.tokenize(tokenizer)
+    return ["Original Word", "Lemmatized Word"], zip(document.tokens, document.lemmas.tolist())
+
+
+def _stems_table(document, tokenizer):
+    document.tokenize(tokenizer)
+    return ["Original Word", "Stemmed Word"], zip(document.tokens, document.stems.tolist())
+
+
+def _stopwords_table(document, tokenizer):
+    from resources import get_stopwords
+    stop_words = get_stopwords("english")
+    document.tokenize(tokenizer)
+    _, types = document.vocabulary
+    filtered = document.map_types(["" if word.lower() in stop_words else word for word in types])
+    return ["Original Word", "Filtered Word"], zip(document.tokens, filtered.tolist())
+
+
+def _frequency_table(document, tokenizer):
+    counts = document.word_counts(tokenizer=tokenizer)
+    return ["Word", "Frequency"], sorted(counts.items(), key=lambda item: item[1], reverse=True)
+
+
+def _sentiment_table(document, tokenizer):
+    from sentiment import label_polarity
+    polarity = document.polarity
+    return ["Sentence", "Polarity", "Sentiment"], zip(
+        document.sentences, polarity.tolist(), label_polarity(polarity).tolist()
+    )
+
+
+# Whole-document analyses, with the same columns as the tables shown in the app
+ANALYSES = {
+    "tokens": _tokens_table,
+    "pos": _pos_table,
+    "lemmas": _lemmas_table,
+    "stems": _stems_table,
+    "stopwords": _stopwords_table,
+    "frequency": _frequency_table,
+    "sentiment": _sentiment_table,
+}
+
+# "rows" analyses every row of a CSV file as its own document (see batch.py)
+ROW_ANALYSIS = "rows"
+
+
+# Function to expand directories and glob patterns into the list of input files
+def find_inputs(patterns):
+    paths = []
+    for pattern in patterns:
+        if os.path.isdir(pattern):
+            for directory, _, names in os.walk(pattern):
+                paths.extend(os.path.join(directory, name) for name in sorted(names))
+        else:
+            paths.extend(sorted(glob.glob(pattern, recursive=True)) or [pattern])
+    inputs = {}
+    for path in paths:
+        if path.lower().endswith(INPUT_EXTENSIONS) and os.path.isfile(path):
+            inputs.setdefault(os.path.abspath(path), path)
+    return list(inputs.values())
+
+
+def file_digest(path):
+    digest = hashlib.sha256()
+    for block in iter_blocks(path):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to name the output of one analysis of one input file.
+# The short hash of the full path keeps files of the same name in different directories apart.
+def output_name(path, analysis, fmt):
+    stem = os.path.splitext(os.path.basename(path))[0]
+    path_hash = hashlib.sha256(os.path.abspath(path).encode("utf-8")).hexdigest()[:8]
+    return f"{stem}-{path_hash}.{analysis}{EXPORT_FORMATS[fmt][0]}"
+
+
+# Function to read the manifest: the (input hash, output name) pairs already written
+def read_manifest(output_dir):
+    done = set()
+    try:
+        with open(os.path.join(output_dir, MANIFEST_NAME), encoding="utf-8") as f:
+            for line in f:
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # A line cut short by an interruption
+                    continue
+                done.add((entry["sha256"], entry["output"]))
+    except FileNotFoundError:
+        pass
+    return done
+
+
+def _text_columns(path, text_columns):
+    if text_columns:
+        return list(text_columns)
+    return [name for name, is_text in csv_columns(path) if is_text]
+
+
+# Function to run the analyses of one file; it runs in a worker process.
+# Returns the written outputs as (analysis, output name, seconds) tuples, and the error that stopped
+# the remaining analyses (None if all of them were written).
+def process_file(path, digest, analyses, output_dir, fmt, text_columns=None, tokenizer=DEFAULT_TOKENIZER):
+    from document import DocumentAnalysis
+    written = []
+    try:
+        is_csv = path.lower().endswith(".csv")
+        columns = _text_columns(path, text_columns) if is_csv else None
+        # Not taken from the shared document cache: each file is analysed once and then dropped
+        if is_csv:
+            document = DocumentAnalysis(lambda: iter_csv_text_chunks(path, columns), digest)
+        else:
+            document = DocumentAnalysis(lambda: iter_text_chunks(path), digest)
+
+        for analysis in analyses:
+            start = time.perf_counter()
+            name = output_name(path, analysis, fmt)
+            if analysis == ROW_ANALYSIS:
+                from batch import analyse_rows, read_rows
+                from resources import get_stopwords
+                results = analyse_rows(read_rows(path), columns, stop_words=get_stopwords("english"), tokenizer=tokenizer)
+                write_export(os.path.join(output_dir, name), results.columns,
+                             results.itertuples(index=False, name=None), fmt)
+            else:
+                header, rows = ANALYSES[analysis](document, tokenizer)
+                write_export(os.path.join(output_dir, name), header, rows, fmt)
+            written.append((analysis, name, time.perf_counter() - start))
+    except Exception as error:
+        # The outputs already written are still returned, so the next run does not redo them
+        return written, f"{type(error).__name__}: {error}"
+    return written, None
+
+
+def _log(message):
+    print(message, file=sys.stderr, flush=True)
+
+
+# Function to analyse many files across the shared process pool, skipping work the manifest records as done
+def run(inputs, analyses, output_dir, fmt="Parquet", workers=1, text_columns=None, tokenizer=DEFAULT_TOKENIZER):
+    os.makedirs(output_dir, exist_ok=True)
+    done = read_manifest(output_dir)
+
+    jobs = []
+    for path in find_inputs(inputs):
+        digest = file_digest(path)
+        remaining = []
+        for analysis in analyses:
+            if analysis == ROW_ANALYSIS and not path.lower().endswith(".csv"):
+                continue
+            # Done only if the same content was written in the same format and the output is still there
+            output = output_name(path, analysis, fmt)
+            if (digest, output) not in done or not os.path.exists(os.path.join(output_dir, output)):
+                remaining.append(analysis)
+        if remaining:
+            jobs.append((path, digest, remaining))
+    _log(f"{len(jobs)} file(s) to analyse, {len(done)} result(s) already in {output_dir}")
+    if not jobs:
+        return 0
+
+    workers = max(1, min(workers, MAX_WORKERS, len(jobs)))
+    failures = 0
+    with open(os.path.join(output_dir, MANIFEST_NAME), "a", encoding="utf-8") as manifest:
+        # At most `workers` files are analysed at a time on the shared pool
+        completed = pool_completed(process_file, (
+            (path, digest, remaining, output_dir, fmt, text_columns, tokenizer) for path, digest, remaining in jobs
+        ), workers)
+        try:
+            for finished, ((path, digest, *_), future) in enumerate(completed, start=1):
+                try:
+                    written, error = future.result()
+                except Exception as crash:
+                    # e.g. the worker process died
+                    written, error = [], f"{type(crash).__name__}: {crash}"
+                # Only recorded once the outputs are complete on disk, including those written before a failure
+                for analysis, name, seconds in written:
+                    manifest.write(json.dumps({
+                        "input": path, "sha256": digest, "analysis": analysis,
+                        "output": name, "seconds": round(seconds, 3),
+                    }) + "\n")
+                manifest.flush()
+                summary = ", ".join(f"{analysis} {seconds:.1f}s" for analysis, _, seconds in written)
+                if error:
+                    failures += 1
+                    summary = f"{summary}, then failed: {error}" if summary else f"failed: {error}"
+                _log(f"[{finished}/{len(jobs)}] {path}: {summary}")
+        except KeyboardInterrupt:
+            # Files not started yet are dropped
+            completed.close()
+            _log("Interrupted; run the same command again to resume.")
+            raise
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="directories, files or glob patterns of .txt/.csv files")
+    parser.add_argument("-a", "--analyses", nargs="+", choices=list(ANALYSES) + [ROW_ANALYSIS],
+                        default=["sentiment", "frequency"], help="analyses to run (default: sentiment frequency)")
+    parser.add_argument("-o", "--output-dir", required=True, help="directory for the results and the manifest")
+    parser.add_argument("-f", "--format", choices=list(OUTPUT_FORMATS), default="parquet",
+                        help="output format (default: parquet)")
+    parser.add_argument("-w", "--workers", type=int, default=MAX_WORKERS,
+                        help=f"worker processes (default: {MAX_WORKERS})")
+    parser.add_argument("-c", "--text-columns", nargs="+",
+                        help="CSV columns to analyse (default: the columns that hold text)")
+    parser.add_argument("-t", "--tokenizer", choices=TOKENIZERS, default=DEFAULT_TOKENIZER,
+                        help=f"word tokenizer; both give the same tokens (default: {DEFAULT_TOKENIZER})")
+    args = parser.parse_args(argv)
+
+    failures = run(args.inputs, args.analyses, args.output_dir, OUTPUT_FORMATS[args.format],
+                   args.workers, args.text_columns, args.tokenizer)
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,243 @@
+import contextvars
+import hashlib
+import re
+import threading
+import time
+from collections import deque, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from urllib.parse import urlsplit, urlunsplit
+from urllib.robotparser import RobotFileParser
+import numpy as np
+import requests
+from instrument import span
+from p1 import PER_HOST_LIMIT, REQUEST_TIMEOUT, get_scraped_content, get_session
+
+# Crawl budget: how many links away from the seed to go, and how many pages to fetch at most
+MAX_DEPTH = 2
+MAX_PAGES = 50
+
+# Seconds between two requests to the same host, unless its robots.txt asks for a longer Crawl-delay
+CRAWL_DELAY = 1.0
+
+# Pages whose 64-bit SimHash fingerprints differ in at most this many bits are near-duplicates
+NEAR_DUPLICATE_BITS = 3
+
+# Words per shingle the fingerprints are built from
+SHINGLE_WORDS = 3
+
+# Links to files that are not pages are not followed
+SKIPPED_EXTENSIONS = (
+    ".pdf", ".zip", ".gz", ".tar", ".rar", ".7z", ".exe", ".dmg", ".jpg", ".jpeg", ".png", ".gif",
+    ".svg", ".webp", ".ico", ".mp3", ".mp4", ".avi", ".mov", ".webm", ".css", ".js", ".json", ".xml",
+    ".doc", ".docx", ".xls", ".xlsx", ".ppt", ".pptx", ".csv",
+)
+
+# Status of each crawled URL
+OK, DUPLICATE, BLOCKED, FAILED = "ok", "duplicate", "blocked", "failed"
+
+CrawledPage = namedtuple("CrawledPage", "url depth title paragraphs status detail")
+
+_WORD = re.compile(r"\w+")
+
+_DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+# Function to put a URL in the one form the frontier compares: lowercase scheme and host,
+# no default port, no fragment and "/" for an empty path. Returns None for URLs that are not http(s).
+def normalize_url(url):
+    try:
+        parts = urlsplit(url.strip())
+        port = parts.port
+    except ValueError:
+        return None
+    scheme = parts.scheme.lower()
+    if scheme not in _DEFAULT_PORTS or not parts.hostname:
+        return None
+    netloc = parts.hostname.lower()
+    if port and port != _DEFAULT_PORTS[scheme]:
+        netloc += f":{port}"
+    return urlunsplit((scheme, netloc, parts.path or "/", parts.query, ""))
+
+
+def _site(url):
+    host = urlsplit(url).netloc
+    return host[4:] if host.startswith("www.") else host
+
+
+class Frontier:
+    """The URLs left to crawl, breadth first, each with its depth.
+
+    A URL is only ever added once, so links found again on later pages
+    (and links between pages of a listing) are not fetched twice.
+    """
+
+    def __init__(self):
+        self._queue = deque()
+        self._seen = set()
+
+    def add(self, url, depth):
+        if url in self._seen:
+            return False
+        self._seen.add(url)
+        self._queue.append((url, depth))
+        return True
+
+    def pop(self):
+        return self._queue.popleft()
+
+    def __len__(self):
+        return len(self._queue)
+
+
+# Function to fingerprint a page's paragraphs with a 64-bit SimHash over word shingles.
+# Pages with mostly the same text get fingerprints a few bits apart.
+def simhash(paragraphs):
+    words = _WORD.findall(" ".join(paragraphs).lower())
+    if not words:
+        return 0
+    # Each shingle counts once, so text repeated on a page (boilerplate, table cells) does not outweigh the rest
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    hashes = np.frombuffer(
+        b"".join(hashlib.blake2b(shingle.encode("utf-8"), digest_size=8).digest() for shingle in shingles),
+        dtype=">u8",
+    )
+    # One row of 64 bits per shingle, most significant bit first; each bit goes the way most shingles vote
+    bits = np.unpackbits(hashes.view(np.uint8)).reshape(-1, 64)
+    votes = 2 * bits.sum(axis=0, dtype=np.int64) - len(shingles)
+    return int("".join("1" if vote > 0 else "0" for vote in votes), 2)
+
+
+class SimHashIndex:
+    """Fingerprints of the pages kept so far, to find near-duplicates of a new one.
+
+    Fingerprints are indexed by each of their ``max_bits + 1`` bands: two
+    fingerprints at most ``max_bits`` bits apart agree on at least one band,
+    so only fingerprints sharing a band with the new one are compared.
+    """
+
+    def __init__(self, max_bits=NEAR_DUPLICATE_BITS):
+        self.max_bits = max_bits
+        bands = max_bits + 1
+        self._bands = [(64 * i // bands, 64 * (i + 1) // bands) for i in range(bands)]
+        self._tables = [{} for _ in self._bands]
+
+    def _keys(self, fingerprint):
+        return [(fingerprint >> start) & ((1 << (end - start)) - 1) for start, end in self._bands]
+
+    # Function to get the URL of a page near-duplicate of the fingerprint, or None
+    def find(self, fingerprint):
+        for table, key in zip(self._tables, self._keys(fingerprint)):
+            for other, url in table.get(key, ()):
+                if (fingerprint ^ other).bit_count() <= self.max_bits:
+                    return url
+        return None
+
+    def add(self, fingerprint, url):
+        for table, key in zip(self._tables, self._keys(fingerprint)):
+            table.setdefault(key, []).append((fingerprint, url))
+
+
+# Function to fetch and parse a host's robots.txt; hosts without one may be crawled entirely
+def get_robots(url, session, timeout=REQUEST_TIMEOUT):
+    parts = urlsplit(url)
+    robots = RobotFileParser(urlunsplit((parts.scheme, parts.netloc, "/robots.txt", "", "")))
+    with span("crawl.robots", host=parts.netloc):
+        try:
+            response = session.get(robots.url, timeout=timeout)
+        except requests.RequestException:
+            # The site cannot say what is allowed, so nothing is crawled
+            robots.disallow_all = True
+            return robots
+    # As in RobotFileParser.read(), 401/403 forbid everything and other client errors allow everything;
+    # a server error is taken as forbidding everything until the site is crawled again
+    if response.status_code in (401, 403) or response.status_code >= 500:
+        robots.disallow_all = True
+    elif response.status_code >= 400:
+        robots.allow_all = True
+    else:
+        robots.parse(response.text.splitlines())
+    return robots
+
+
+class _Politeness:
+    """Spaces out the requests made to each host by at least its delay."""
+
+    def __init__(self):
+        self._next = {}
+        self._lock = threading.Lock()
+
+    def wait(self, host, delay):
+        with self._lock:
+            now = time.monotonic()
+            start = max(now, self._next.get(host, now))
+            self._next[host] = start + delay
+        if start > now:
+            time.sleep(start - now)
+
+
+# Function to crawl a site breadth first from a seed URL, yielding a CrawledPage for every URL
+# as soon as it is done. Only pages of the seed's site are followed, up to max_depth links away
+# and max_pages fetches; robots.txt is respected and near-duplicate pages are reported as
+# duplicates without their paragraphs.
+def crawl(seed, max_depth=MAX_DEPTH, max_pages=MAX_PAGES, delay=CRAWL_DELAY, per_host=PER_HOST_LIMIT,
+          timeout=REQUEST_TIMEOUT, session=None, near_duplicate_bits=NEAR_DUPLICATE_BITS):
+    session = session or get_session()
+    start = normalize_url(seed)
+    if start is None:
+        raise ValueError(f"Not an http(s) URL: {seed!r}")
+    site = _site(start)
+    user_agent = session.headers.get("User-Agent", "*")
+    frontier = Frontier()
+    frontier.add(start, 0)
+    fingerprints = SimHashIndex(near_duplicate_bits)
+    politeness = _Politeness()
+    robots = {}
+    fetched = 0
+
+    def fetch(url, host_delay):
+        politeness.wait(urlsplit(url).netloc, host_delay)
+        return get_scraped_content(url, session=session, timeout=timeout, links=True)
+
+    with ThreadPoolExecutor(max_workers=per_host) as executor:
+        pending = {}
+        while frontier or pending:
+            while frontier and len(pending) < per_host and fetched + len(pending) < max_pages:
+                url, depth = frontier.pop()
+                host = urlsplit(url).netloc
+                if host not in robots:
+                    robots[host] = get_robots(url, session, timeout)
+                if not robots[host].can_fetch(user_agent, url):
+                    yield CrawledPage(url, depth, None, None, BLOCKED, "Disallowed by robots.txt")
+                    continue
+                host_delay = max(delay, float(robots[host].crawl_delay(user_agent) or 0))
+                # Each fetch runs in a copy of the caller's context, so its spans join the caller's run
+                future = executor.submit(contextvars.copy_context().run, fetch, url, host_delay)
+                pending[future] = url, depth
+            if not pending:
+                break
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                url, depth = pending.pop(future)
+                fetched += 1
+                try:
+                    title, paragraphs, links = future.result()
+                except requests.RequestException as e:
+                    yield CrawledPage(url, depth, None, None, FAILED, str(e))
+                    continue
+                if title is None and paragraphs is None:
+                    yield CrawledPage(url, depth, None, None, FAILED, "Failed to retrieve content from the URL.")
+                    continue
+                if depth < max_depth:
+                    # Links of duplicates are followed too: page 2 of a listing links to items page 1 does not
+                    for link in links:
+                        link = normalize_url(link)
+                        if link and _site(link) == site and not urlsplit(link).path.lower().endswith(SKIPPED_EXTENSIONS):
+                            frontier.add(link, depth + 1)
+                with span("crawl.fingerprint", paragraphs=len(paragraphs)):
+                    fingerprint = simhash(paragraphs)
+                    original = fingerprints.find(fingerprint)
+                if original is not None:
+                    yield CrawledPage(url, depth, title, None, DUPLICATE, f"Near-duplicate of {original}")
+                    continue
+                fingerprints.add(fingerprint, url)
+                yield CrawledPage(url, depth, title, paragraphs, OK, None)
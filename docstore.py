@@ -0,0 +1,210 @@
+import atexit
+import hashlib
+import mmap
+import os
+import shutil
+import tempfile
+import threading
+import time
+import weakref
+from ingest import iter_blocks
+
+# Documents at least this large are kept in memory-mapped temp files; smaller ones stay in memory
+MMAP_THRESHOLD = 4 * 1024 * 1024
+
+# Bytes of documents no session refers to that are kept, in case the same file is uploaded again
+MAX_IDLE_BYTES = 1024 * 1024 * 1024
+
+# One directory per process, removed when the process exits
+STORE_DIR = os.path.join(tempfile.gettempdir(), f"cdac-app-docstore-{os.getpid()}")
+
+_store = None
+_store_lock = threading.Lock()
+
+
+class DocumentHandle:
+    """A lightweight reference to a document in the store.
+
+    Sessions keep handles instead of the document itself; every handle
+    holds one reference, released when the handle is released or garbage
+    collected. ``getbuffer()`` gives a zero-copy view of the content, so
+    handles can be read wherever an in-memory upload can (see ingest.py).
+    """
+
+    __slots__ = ("digest", "size", "_store", "_release", "__weakref__")
+
+    def __init__(self, store, digest, size):
+        self.digest = digest
+        self.size = size
+        self._store = store
+        self._release = weakref.finalize(self, store._release, digest)
+
+    def getbuffer(self):
+        return self._store._view(self.digest)
+
+    def release(self):
+        self._release()
+
+    def __repr__(self):
+        return f"DocumentHandle({self.digest[:12]}, {self.size:,} bytes)"
+
+
+class _Entry:
+    __slots__ = ("size", "path", "data", "refs", "last_used")
+
+    def __init__(self, size, path, data):
+        self.size = size
+        self.path = path
+        self.data = data
+        self.refs = 0
+        self.last_used = time.monotonic()
+
+
+class DocumentStore:
+    """Process-wide, content-addressed store of uploaded documents.
+
+    The same content is stored once, however many sessions upload it.
+    Large documents live in memory-mapped files, so their pages are shared
+    and can be dropped by the OS under memory pressure. Documents nobody
+    refers to are evicted, least recently used first, beyond ``max_idle_bytes``.
+    """
+
+    def __init__(self, directory=STORE_DIR, mmap_threshold=MMAP_THRESHOLD, max_idle_bytes=MAX_IDLE_BYTES):
+        self.directory = directory
+        self.mmap_threshold = mmap_threshold
+        self.max_idle_bytes = max_idle_bytes
+        self._entries = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    # Function to add a document from a path, file or upload and return a handle to it.
+    # The content is streamed to disk while it is hashed; a document already stored is not kept twice.
+    def put(self, source):
+        if isinstance(source, DocumentHandle):
+            return self.open(source.digest)
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                for block in iter_blocks(source):
+                    digest.update(block)
+                    f.write(block)
+                    size += len(block)
+            digest = digest.hexdigest()
+            with self._lock:
+                if digest not in self._entries:
+                    self._entries[digest] = self._load(digest, tmp_path, size)
+                    tmp_path = None
+                return self._handle(digest)
+        finally:
+            if tmp_path is not None:
+                os.remove(tmp_path)
+
+    def _load(self, digest, tmp_path, size):
+        if size < self.mmap_threshold:
+            with open(tmp_path, "rb") as f:
+                data = f.read()
+            os.remove(tmp_path)
+            return _Entry(size, None, data)
+        path = os.path.join(self.directory, digest)
+        os.replace(tmp_path, path)
+        with open(path, "rb") as f:
+            data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if size else b""
+        return _Entry(size, path, data)
+
+    def _handle(self, digest):
+        # Called with the lock held
+        entry = self._entries[digest]
+        entry.refs += 1
+        entry.last_used = time.monotonic()
+        return DocumentHandle(self, digest, entry.size)
+
+    # Function to get another handle to a stored document, or None if it has been evicted
+    def open(self, digest):
+        with self._lock:
+            if digest not in self._entries:
+                return None
+            return self._handle(digest)
+
+    def _view(self, digest):
+        with self._lock:
+            entry = self._entries[digest]
+            entry.last_used = time.monotonic()
+            return memoryview(entry.data)
+
+    def _release(self, digest):
+        with self._lock:
+            entry = self._entries.get(digest)
+            if entry is not None:
+                entry.refs -= 1
+        self.evict()
+
+    # Function to drop unreferenced documents, least recently used first, until they fit in max_idle_bytes
+    def evict(self, max_idle_bytes=None):
+        limit = self.max_idle_bytes if max_idle_bytes is None else max_idle_bytes
+        with self._lock:
+            idle = sorted(
+                (entry.last_used, digest) for digest, entry in self._entries.items() if entry.refs <= 0
+            )
+            idle_bytes = sum(self._entries[digest].size for _, digest in idle)
+            for _, digest in idle:
+                if idle_bytes <= limit:
+                    break
+                entry = self._entries[digest]
+                if isinstance(entry.data, mmap.mmap):
+                    try:
+                        entry.data.close()
+                    except BufferError:
+                        # A view of it is still being read; it is tried again on the next eviction
+                        continue
+                    os.remove(entry.path)
+                del self._entries[digest]
+                idle_bytes -= entry.size
+
+    def stats(self):
+        with self._lock:
+            entries = list(self._entries.values())
+        return {
+            "documents": len(entries),
+            "bytes": sum(entry.size for entry in entries),
+            "mapped_bytes": sum(entry.size for entry in entries if entry.path),
+            "referenced": sum(1 for entry in entries if entry.refs > 0),
+        }
+
+    def close(self):
+        with self._lock:
+            for entry in self._entries.values():
+                if isinstance(entry.data, mmap.mmap):
+                    try:
+                        entry.data.close()
+                    except BufferError:
+                        pass
+            self._entries.clear()
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+
+# Function to get the document store shared by every session of this process
+def get_document_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = DocumentStore()
+            atexit.register(_store.close)
+        return _store
+
+
+# Function to keep a session's upload in the store and return the session's handle to it.
+# The upload is only stored again when another file is uploaded, not on every rerun.
+def store_upload(state, upload, key="document_ref"):
+    if upload is None:
+        state.pop(key, None)
+        return None
+    upload_id = getattr(upload, "file_id", None) or (upload.name, upload.size)
+    stored = state.get(key)
+    if stored is not None and stored[0] == upload_id:
+        return stored[1]
+    handle = get_document_store().put(upload)
+    # The previous upload's handle is dropped with it, which releases its reference
+    state[key] = (upload_id, handle)
+    return handle
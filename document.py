@@ -0,0 +1,331 @@
+import hashlib
+import sys
+import threading
+from cachetools import LRUCache
+import numpy as np
+import pandas as pd
+from ingest import csv_columns, iter_blocks, iter_csv_text_chunks, iter_text_chunks
+from tagging import tag_sentences
+from collections import Counter
+from frequency import count_segments, count_tokens
+from resources import get_lemmatizer, get_sentence_tokenizer, get_stemmer
+from instrument import span
+from segments import per_segment, segment_sentences
+from tokenizer import DEFAULT_TOKENIZER, tokenize_sentences
+
+# Number of analysed documents kept in memory, shared by every Streamlit session
+DOCUMENT_CACHE_SIZE = 8
+
+# Number of CSV files whose column lists are remembered, shared by every Streamlit session
+COLUMNS_CACHE_SIZE = 64
+
+# Number of word types whose lemma and stem are remembered across documents
+WORD_MEMO_SIZE = 500_000
+
+_document_cache = LRUCache(maxsize=DOCUMENT_CACHE_SIZE)
+_document_cache_lock = threading.Lock()
+
+_columns_cache = LRUCache(maxsize=COLUMNS_CACHE_SIZE)
+
+_lemma_memo = LRUCache(maxsize=WORD_MEMO_SIZE)
+_stem_memo = LRUCache(maxsize=WORD_MEMO_SIZE)
+_word_memo_lock = threading.Lock()
+
+
+# Function to apply a word-level transform to each distinct word type once, through a shared memo
+def _map_types(vocabulary, memo, transform):
+    mapped = np.empty(len(vocabulary), dtype=object)
+    missing = []
+    with _word_memo_lock:
+        for i, word in enumerate(vocabulary):
+            value = memo.get(word)
+            if value is None:
+                missing.append(i)
+            else:
+                mapped[i] = value
+    # The transform runs outside the lock; concurrent documents may compute a word twice at worst
+    for i in missing:
+        mapped[i] = transform(vocabulary[i])
+    with _word_memo_lock:
+        for i in missing:
+            memo[vocabulary[i]] = mapped[i]
+    return mapped
+
+
+# Function to turn one value per word type into a categorical column with one entry per token.
+# Word types mapping to the same value (e.g. "cats" and "cat" to "cat") share a category.
+def types_to_categorical(codes, values):
+    value_codes, categories = pd.factorize(np.asarray(values, dtype=object))
+    return pd.Categorical.from_codes(value_codes.astype(np.int32)[codes], categories)
+
+
+# Function to word-tokenize the sentences of segments. The tokens of a segment are kept compactly as
+# (word types, the int32 index of every token's type, the number of tokens of every sentence).
+def _tokenize_segments(batch, tokenizer=DEFAULT_TOKENIZER, workers=1):
+    sentence_tokens = iter(tokenize_sentences(
+        [sentence for _, sentences in batch for sentence in sentences], tokenizer, workers
+    ))
+    segments = []
+    for _, sentences in batch:
+        tokenized = [next(sentence_tokens) for _ in sentences]
+        lengths = np.fromiter(map(len, tokenized), dtype=np.int32, count=len(tokenized))
+        codes, types = pd.factorize(np.array([token for tokens in tokenized for token in tokens], dtype=object))
+        # Interned, so every segment (and the documents built from them) shares one string per word type
+        segments.append(([sys.intern(word) for word in types.tolist()], codes.astype(np.int32), lengths))
+    return segments
+
+
+# Function to get the token list of every sentence of a tokenized segment
+def _segment_token_lists(segment):
+    types, codes, lengths = segment
+    tokens = np.array(types, dtype=object)[codes].tolist()
+    ends = np.cumsum(lengths).tolist()
+    return [tokens[start:end] for start, end in zip([0] + ends[:-1], ends)]
+
+
+# Function to compute the cache key of a piece of text
+def content_hash(text):
+    if isinstance(text, str):
+        text = text.encode("utf-8")
+    return hashlib.sha256(text).hexdigest()
+
+
+class DocumentAnalysis:
+    """Lazily computed NLP stages of one document.
+
+    Each stage (sentences, tokens, POS tags, polarity, lemmas, stems) is computed on
+    first access and remembered, so it runs at most once per document.
+    ``chunks`` is a callable returning an iterable of text chunks, so the
+    document text never has to be held as one string.
+
+    Tokens, POS tags, polarity and word counts are computed per segment of
+    sentences (see segments.py) and the segment results are cached across
+    documents, so re-analysing an edited or extended file only computes the
+    segments that changed.
+    """
+
+    def __init__(self, chunks, key):
+        self._chunks = chunks
+        self.key = key
+        self._results = {}
+        self._lock = threading.RLock()
+
+    def _stage(self, name, compute):
+        # The lock makes concurrent sessions wait for a single computation
+        with self._lock:
+            if name not in self._results:
+                with span(f"document.{name if isinstance(name, str) else name[0]}"):
+                    self._results[name] = compute()
+            return self._results[name]
+
+    def iter_sentences(self):
+        if "sentences" in self._results:
+            yield from self._results["sentences"]
+            return
+        tokenizer = get_sentence_tokenizer()
+        pending = ""
+        for chunk in self._chunks():
+            # Punkt takes the end of the buffer for the end of the text, which can change how
+            # the last two sentences are split (e.g. "Deal!!!! " ends as "Deal!!!" and "!").
+            # Both are carried over, so Punkt sees them with the text that follows, as on the whole text.
+            buffer = pending + chunk
+            spans = list(tokenizer.span_tokenize(buffer))
+            if not spans:
+                pending = ""
+                continue
+            keep = max(len(spans) - 2, 0)
+            # Punkt splits runs like "???" inside a word; splitting again from there would cut them
+            # differently, so the carried text starts at a sentence that starts after whitespace
+            while keep > 0 and not buffer[spans[keep][0] - 1].isspace():
+                keep -= 1
+            for start, end in spans[:keep]:
+                yield buffer[start:end]
+            pending = buffer[spans[keep][0]:]
+        if pending:
+            yield from tokenizer.tokenize(pending)
+
+    def iter_segments(self):
+        return segment_sentences(self.iter_sentences())
+
+    @property
+    def sentences(self):
+        return self._stage("sentences", lambda: list(self.iter_sentences()))
+
+    def _segment_tokens(self, segments, tokenizer=DEFAULT_TOKENIZER, workers=1, cancel=None, progress=None):
+        return per_segment(
+            "tokens", segments, lambda batch: _tokenize_segments(batch, tokenizer, workers), cancel, progress
+        )
+
+    def tokenize(self, tokenizer=DEFAULT_TOKENIZER, workers=1, cancel=None, progress=None):
+        # The same tokens as word_tokenize(text), kept as the document's distinct word types and,
+        # for every token, the index (int32) of its type. The engine and worker count only change
+        # how fast they are computed, not the result. `cancel` and `progress` are as in tag_column().
+        def compute():
+            index = {}
+            codes = []
+            segments = self._segment_tokens(self.iter_segments(), tokenizer, workers, cancel, progress)
+            for types, segment_codes, _ in segments:
+                # The segment's types are numbered in the document, then its tokens are renumbered at once
+                numbers = np.fromiter(
+                    (index.setdefault(word, len(index)) for word in types), dtype=np.int32, count=len(types)
+                )
+                codes.append(numbers[segment_codes])
+            return np.concatenate(codes) if codes else np.zeros(0, dtype=np.int32), list(index)
+        return self._stage("vocabulary", compute)
+
+    @property
+    def tokens(self):
+        # Built from the vocabulary when asked for; the document does not keep them
+        codes, types = self.vocabulary
+        return np.array(types, dtype=object)[codes].tolist()
+
+    @property
+    def pos_tags(self):
+        return self.tag()
+
+    def tag(self, workers=1):
+        # (word, tag) pairs, built from the compact tag column when they are asked for
+        return list(zip(self.tokens, self.tag_column(workers)))
+
+    def tag_column(self, workers=1, cancel=None, progress=None):
+        # The worker count only changes how fast the tags are computed, not the result.
+        # `cancel` and `progress` are passed to per_segment(), to stop or follow a long run between batches.
+        def tag(batch):
+            # The tokens of the segments come from the segment cache too
+            segment_tokens = [_segment_token_lists(segment) for segment in self._segment_tokens(batch, workers=workers)]
+            pairs = tag_sentences([sentence for segment in segment_tokens for sentence in segment], workers)
+            tags, start = [], 0
+            for segment in segment_tokens:
+                end = start + sum(len(sentence) for sentence in segment)
+                tags.append([tag for _, tag in pairs[start:end]])
+                start = end
+            return tags
+
+        return self._stage("pos_tags", lambda: pd.Categorical([
+            tag for segment in per_segment("pos_tags", self.iter_segments(), tag, cancel, progress) for tag in segment
+        ]))
+
+    @property
+    def polarity(self):
+        return self.score()
+
+    def score(self, cancel=None, progress=None):
+        # One polarity score per sentence, as TextBlob(sentence).sentiment.polarity.
+        # sentiment (and with it textblob) is only imported when a document is scored.
+        # `cancel` and `progress` are passed to per_segment(), as in tag_column().
+        from sentiment import score_sentences
+
+        def score(batch):
+            polarity = score_sentences([sentence for _, sentences in batch for sentence in sentences])
+            # Each segment gets a copy, so a cached segment does not keep the whole batch's array alive
+            return [part.copy() for part in np.split(polarity, np.cumsum([len(sentences) for _, sentences in batch])[:-1])]
+
+        def compute():
+            scores = list(per_segment("polarity", self.iter_segments(), score, cancel, progress))
+            return np.concatenate(scores) if scores else np.zeros(0)
+        return self._stage("polarity", compute)
+
+    def word_counts(self, lowercase=False, stop_words=None, workers=1, tokenizer=DEFAULT_TOKENIZER):
+        # Counted from the vocabulary when it exists, otherwise from the sentence stream
+        def compute():
+            if "vocabulary" in self._results:
+                # Each word type is folded and checked against the stopwords once, not once per token
+                codes, types = self._results["vocabulary"]
+                counts = np.bincount(codes, minlength=len(types))
+                return count_tokens(types, lowercase, stop_words, counts.tolist())
+            # Otherwise the counts of each segment are cached and added up, in bounded memory
+            counts = Counter()
+            for segment_counts in per_segment(key, self.iter_segments(), lambda batch: count_segments(
+                [sentences for _, sentences in batch], workers, lowercase, stop_words, tokenizer
+            )):
+                counts.update(segment_counts)
+            return counts
+        key = ("word_counts", lowercase, frozenset(stop_words or ()))
+        return self._stage(key, compute)
+
+    @property
+    def vocabulary(self):
+        # Distinct word types, and for every token the index (int32) of its type
+        return self.tokenize()
+
+    @property
+    def token_column(self):
+        # The tokens as a categorical column over the vocabulary, for tables and exports
+        def compute():
+            codes, types = self.vocabulary
+            # Object categories refer to the vocabulary's strings instead of copying them into Arrow strings
+            return pd.Categorical.from_codes(codes, pd.Index(types, dtype=object))
+        return self._stage("token_column", compute)
+
+    def map_types(self, values):
+        # A categorical column giving every token the value of its word type
+        codes, _ = self.vocabulary
+        return types_to_categorical(codes, values)
+
+    @property
+    def lemmas(self):
+        def compute():
+            _, types = self.vocabulary
+            return self.map_types(_map_types(types, _lemma_memo, get_lemmatizer().lemmatize))
+        return self._stage("lemmas", compute)
+
+    @property
+    def stems(self):
+        def compute():
+            _, types = self.vocabulary
+            return self.map_types(_map_types(types, _stem_memo, get_stemmer().stem))
+        return self._stage("stems", compute)
+
+
+def _cached_document(key, chunks):
+    with _document_cache_lock:
+        document = _document_cache.get(key)
+        if document is None:
+            document = DocumentAnalysis(chunks, key)
+            _document_cache[key] = document
+        return document
+
+
+# Function to fetch the shared analysis object for a text, creating it if needed
+def get_document(text):
+    if isinstance(text, DocumentAnalysis):
+        return text
+    if isinstance(text, bytes):
+        text = text.decode("utf-8")
+    return _cached_document(content_hash(text), lambda: [text])
+
+
+def _file_digest(file):
+    # Documents from the document store are already addressed by their hash
+    if hasattr(file, "digest"):
+        return file.digest
+    digest = hashlib.sha256()
+    for block in iter_blocks(file):
+        digest.update(block)
+    return digest.hexdigest()
+
+
+# Function to fetch the shared analysis object for an uploaded file without decoding it at once
+def get_document_from_file(file):
+    return _cached_document(_file_digest(file), lambda: iter_text_chunks(file))
+
+
+# Function to list the columns of a CSV upload (see ingest.csv_columns), read once per file content.
+# Streamlit reruns the page on every interaction, and the upload stays the same across them.
+def get_csv_columns(file):
+    key = _file_digest(file)
+    with _document_cache_lock:
+        columns = _columns_cache.get(key)
+    if columns is None:
+        columns = tuple(csv_columns(file))
+        with _document_cache_lock:
+            _columns_cache[key] = columns
+    return list(columns)
+
+
+# Function to fetch the shared analysis object for the chosen text columns of a CSV upload
+def get_document_from_csv(file, columns):
+    columns = tuple(columns)
+    # The same file analysed over other columns is another document
+    key = content_hash(_file_digest(file) + repr(columns))
+    return _cached_document(key, lambda: iter_csv_text_chunks(file, columns))
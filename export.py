@@ -0,0 +1,133 @@
+import csv
+import io
+import os
+import tempfile
+from itertools import islice
+import xlsxwriter
+
+# Excel's row limit per worksheet, header row included
+EXCEL_MAX_ROWS = 1_048_576
+
+# Rows converted at a time when writing Parquet or CSV
+BATCH_ROWS = 100_000
+
+# File extension and MIME type of each export format
+EXPORT_FORMATS = {
+    "Excel": (".xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"),
+    "CSV": (".csv", "text/csv"),
+    "Parquet": (".parquet", "application/vnd.apache.parquet"),
+}
+
+
+def _batches(rows, size):
+    rows = iter(rows)
+    while batch := list(islice(rows, size)):
+        yield batch
+
+
+# Function to stream rows into an xlsx file, starting a new sheet whenever one is full
+def write_excel(file, columns, rows, sheet_name="Sheet1", rows_per_sheet=EXCEL_MAX_ROWS - 1):
+    # constant_memory flushes each row to disk as soon as the next one starts
+    workbook = xlsxwriter.Workbook(file, {
+        "constant_memory": True,
+        "nan_inf_to_errors": True,
+        "strings_to_urls": False,
+        "strings_to_formulas": False,
+    })
+    bold = workbook.add_format({"bold": True})
+    sheet = None
+    for index, row in enumerate(rows):
+        row_number = index % rows_per_sheet + 1
+        if row_number == 1:
+            sheet_number = index // rows_per_sheet + 1
+            name = sheet_name if sheet_number == 1 else f"{sheet_name[:24]} ({sheet_number})"
+            sheet = workbook.add_worksheet(name)
+            sheet.write_row(0, 0, columns, bold)
+        sheet.write_row(row_number, 0, row)
+    if sheet is None:
+        workbook.add_worksheet(sheet_name).write_row(0, 0, columns, bold)
+    workbook.close()
+
+
+# Function to stream rows into a CSV file
+def write_csv(file, columns, rows):
+    text = io.TextIOWrapper(file, encoding="utf-8", newline="")
+    writer = csv.writer(text)
+    writer.writerow(columns)
+    for batch in _batches(rows, BATCH_ROWS):
+        writer.writerows(batch)
+    text.flush()
+    # Hand the binary file back to the caller open
+    text.detach()
+
+
+# Function to stream rows into a Parquet file, one row group per batch
+def write_parquet(file, columns, rows):
+    # pandas and pyarrow are only loaded for Parquet exports
+    import pandas as pd
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    for batch in _batches(rows, BATCH_ROWS):
+        frame = pd.DataFrame(batch, columns=columns)
+        if writer is None:
+            schema = pa.Schema.from_pandas(frame, preserve_index=False)
+            # Columns that are empty in the first batch are typed as strings
+            schema = pa.schema([
+                pa.field(field.name, pa.string()) if pa.types.is_null(field.type) else field
+                for field in schema
+            ])
+            writer = pq.ParquetWriter(file, schema)
+        writer.write_table(pa.Table.from_pandas(frame, schema=schema, preserve_index=False))
+    if writer is None:
+        schema = pa.schema([(column, pa.string()) for column in columns])
+        writer = pq.ParquetWriter(file, schema)
+    writer.close()
+
+
+_WRITERS = {"Excel": write_excel, "CSV": write_csv, "Parquet": write_parquet}
+
+
+# Function to export rows to a temporary file on disk and return its path.
+# The caller owns the file and removes it once it has been handed out.
+def export_rows(columns, rows, fmt="Excel"):
+    extension = EXPORT_FORMATS[fmt][0]
+    fd, path = tempfile.mkstemp(prefix="cdac-export-", suffix=extension)
+    try:
+        with os.fdopen(fd, "wb") as file:
+            _WRITERS[fmt](file, list(columns), rows)
+    except BaseException:
+        os.remove(path)
+        raise
+    return path
+
+
+# Function to export a DataFrame row by row, without building another in-memory copy of it
+def export_dataframe(df, fmt="Excel"):
+    return export_rows(df.columns, df.itertuples(index=False, name=None), fmt)
+
+
+# Function to read an exported file back and remove it
+def read_export(path):
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    finally:
+        os.remove(path)
+
+
+# Function to export rows to a given path.
+# The file is written under a temporary name next to it and renamed once complete,
+# so an interrupted export never leaves a partial file behind.
+def write_export(path, columns, rows, fmt="Excel"):
+    part = path + ".part"
+    try:
+        with open(part, "wb") as file:
+            _WRITERS[fmt](file, list(columns), rows)
+        os.replace(part, path)
+    except BaseException:
+        if os.path.exists(part):
+            os.remove(part)
+        raise
+    return path
@@ -0,0 +1,50 @@
+import heapq
+from collections import Counter
+from itertools import repeat
+from operator import itemgetter
+from pool import MAX_WORKERS, pool_map, split_batches
+from tokenizer import DEFAULT_TOKENIZER, get_word_tokenizer
+
+
+# Function to count tokens, folding case and dropping stopwords while counting.
+# With `weights`, each token stands for that many occurrences (e.g. word types and their counts).
+def count_tokens(tokens, lowercase=False, stop_words=None, weights=None):
+    if weights is not None:
+        counts = Counter()
+        for token, weight in zip(tokens, weights):
+            if weight and not (stop_words and token.lower() in stop_words):
+                counts[token.lower() if lowercase else token] += weight
+        return counts
+    if lowercase:
+        tokens = (token.lower() for token in tokens)
+    if stop_words:
+        tokens = (token for token in tokens if token.lower() not in stop_words)
+    return Counter(tokens)
+
+
+def _count_sentences(sentences, lowercase, stop_words, tokenizer=DEFAULT_TOKENIZER):
+    tokenize = get_word_tokenizer(tokenizer)
+    tokens = (token for sentence in sentences for token in tokenize(sentence))
+    return count_tokens(tokens, lowercase, stop_words)
+
+
+def _count_segment_batch(segments, lowercase, stop_words, tokenizer=DEFAULT_TOKENIZER):
+    return [_count_sentences(segment, lowercase, stop_words, tokenizer) for segment in segments]
+
+
+# Function to count the words of each of a list of sentence groups separately, e.g. one Counter per segment
+def count_segments(segments, workers=1, lowercase=False, stop_words=None, tokenizer=DEFAULT_TOKENIZER):
+    workers = max(1, min(workers, MAX_WORKERS))
+    if workers == 1 or len(segments) < 2:
+        return _count_segment_batch(segments, lowercase, stop_words, tokenizer)
+    # pool_map() returns the batches in submission order
+    batches = pool_map(
+        _count_segment_batch, split_batches(segments, workers), repeat(lowercase), repeat(stop_words),
+        repeat(tokenizer), workers=workers,
+    )
+    return [counts for batch in batches for counts in batch]
+
+
+# Function to pick the k most frequent words without sorting the whole table
+def top_k(counts, k=10):
+    return heapq.nlargest(k, counts.items(), key=itemgetter(1))
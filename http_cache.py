@@ -0,0 +1,187 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+
+
+# Function to find the per-user cache directory: %LOCALAPPDATA% on Windows, $XDG_CACHE_HOME or ~/.cache elsewhere
+def _user_cache_dir():
+    base = os.environ.get("LOCALAPPDATA") or os.environ.get("XDG_CACHE_HOME") \
+        or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "cdac-app", "http")
+
+
+# Where scraped pages are cached, and how much disk the cache may use
+CACHE_DIR = _user_cache_dir()
+MAX_CACHE_BYTES = 256 * 1024 * 1024
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# Function to create a directory only the current user can read and write
+def _private_directory(directory):
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    if hasattr(os, "getuid"):
+        stat = os.stat(directory)
+        if stat.st_uid != os.getuid():
+            raise PermissionError(f"Cache directory {directory} belongs to another user")
+        if stat.st_mode & 0o077:
+            os.chmod(directory, 0o700)
+
+
+class HttpCache:
+    """Size-bounded on-disk cache of fetched pages, keyed by URL.
+
+    Each entry keeps the raw response body, its ETag / Last-Modified
+    validators and the extracted result, so an unchanged page can be
+    served after a 304 without parsing it again. An entry is a JSON file
+    of metadata next to a file with the raw body; anything that cannot be
+    read back as written is a cache miss. The least recently used entries
+    are evicted once the cache grows past ``max_bytes``.
+    """
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_CACHE_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        _private_directory(directory)
+        # Bytes used by each entry this process knows of; the directory is only listed again when they exceed max_bytes
+        self._sizes = {}
+        self._total = 0
+        with self._lock:
+            self._scan()
+
+    def _name(self, url):
+        return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+    def _paths(self, name):
+        path = os.path.join(self.directory, name)
+        return path + ".json", path + ".body"
+
+    def get(self, url):
+        meta_path, body_path = self._paths(self._name(url))
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            if not isinstance(meta, dict) or meta.get("url") != url:
+                return None
+            with open(body_path, "rb") as f:
+                body = f.read()
+            if hashlib.sha256(body).hexdigest() != meta["body_hash"]:
+                # The body was replaced by another write in the meantime
+                return None
+            result = meta["result"]
+            entry = {
+                "url": url,
+                "body": body,
+                "body_hash": meta["body_hash"],
+                "etag": meta["etag"],
+                "last_modified": meta["last_modified"],
+                "result": tuple(result) if isinstance(result, list) else result,
+                "parser": meta.get("parser"),
+            }
+        except (OSError, ValueError, KeyError, TypeError):
+            return None
+        self.touch(url)
+        return entry
+
+    def touch(self, url):
+        # The modification time of the metadata records when an entry was last used
+        try:
+            os.utime(self._paths(self._name(url))[0])
+        except FileNotFoundError:
+            pass
+
+    def _write(self, path, data):
+        # Written to a temporary file first, so readers never see a partial file
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+
+    def put(self, url, body, etag=None, last_modified=None, result=None, parser=None):
+        entry = {
+            "url": url,
+            "body": body,
+            "body_hash": hashlib.sha256(body).hexdigest(),
+            "etag": etag,
+            "last_modified": last_modified,
+            "result": result,
+            # The engine the result was extracted with; results of another engine are extracted again
+            "parser": parser,
+        }
+        meta = json.dumps({key: value for key, value in entry.items() if key != "body"}).encode("utf-8")
+        name = self._name(url)
+        meta_path, body_path = self._paths(name)
+        # The body goes first: metadata naming a body that is not there yet would be a miss anyway
+        self._write(body_path, body)
+        self._write(meta_path, meta)
+        with self._lock:
+            self._total += len(body) + len(meta) - self._sizes.get(name, 0)
+            self._sizes[name] = len(body) + len(meta)
+            over = self._total > self.max_bytes
+        if over:
+            self.evict()
+        return entry
+
+    def _scan(self):
+        # Called with the lock held; returns (last used, size, name) of every entry
+        entries = {}
+        for file_name in os.listdir(self.directory):
+            name, extension = os.path.splitext(file_name)
+            if extension not in (".json", ".body"):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, file_name))
+            except FileNotFoundError:
+                continue
+            last_used, size = entries.get(name, (0, 0))
+            if extension == ".json":
+                last_used = stat.st_mtime
+            entries[name] = last_used, size + stat.st_size
+        self._sizes = {name: size for name, (_, size) in entries.items()}
+        self._total = sum(self._sizes.values())
+        return [(last_used, size, name) for name, (last_used, size) in entries.items()]
+
+    def evict(self):
+        with self._lock:
+            # Listed again, as other processes may have added or removed entries meanwhile
+            for _, size, name in sorted(self._scan()):
+                if self._total <= self.max_bytes:
+                    break
+                for path in self._paths(name):
+                    try:
+                        os.remove(path)
+                    except FileNotFoundError:
+                        pass
+                del self._sizes[name]
+                self._total -= size
+
+    def clear(self):
+        with self._lock:
+            for name in os.listdir(self.directory):
+                try:
+                    os.remove(os.path.join(self.directory, name))
+                except FileNotFoundError:
+                    pass
+            self._sizes = {}
+            self._total = 0
+
+
+# Function to get the cache shared by all scrapes in this process; False when no cache can be used
+def get_http_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = HttpCache()
+            except OSError:
+                # Pages are still scraped without a cache, e.g. when the directory belongs to another user
+                _cache = False
+        return _cache
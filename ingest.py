@@ -0,0 +1,124 @@
+import codecs
+import os
+import re
+
+# Size of the byte blocks read from an uploaded file
+BLOCK_SIZE = 1 << 20
+
+# A chunk is forced out at the last space once this many characters are pending without a sentence end
+MAX_PENDING_CHARS = 4 * BLOCK_SIZE
+
+# Bytes of a CSV file parsed at a time by pyarrow
+CSV_BLOCK_SIZE = 16 << 20
+
+# Sentence terminators (with closing quotes/brackets) followed by whitespace, or line breaks
+_SENTENCE_END = re.compile(r'[.!?]+["\')\]]*\s+|\n+')
+
+
+# Function to read a file, path or in-memory upload in fixed-size byte blocks
+def iter_blocks(source, block_size=BLOCK_SIZE):
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, "rb") as f:
+            for block in iter(lambda: f.read(block_size), b""):
+                yield block
+    elif hasattr(source, "getbuffer"):
+        # In-memory uploads (Streamlit's UploadedFile is a BytesIO) are sliced
+        # without touching the shared read position
+        view = source.getbuffer()
+        try:
+            for start in range(0, len(view), block_size):
+                yield bytes(view[start:start + block_size])
+        finally:
+            view.release()
+    else:
+        if hasattr(source, "seek"):
+            source.seek(0)
+        for block in iter(lambda: source.read(block_size), b""):
+            yield block
+
+
+# Function to find where the pending text can be cut without splitting a sentence
+def _chunk_boundary(text):
+    end = 0
+    for match in _SENTENCE_END.finditer(text):
+        end = match.end()
+    if end == 0 and len(text) > MAX_PENDING_CHARS:
+        # No sentence end in sight: fall back to a word boundary, or cut as is
+        end = text.rfind(" ") + 1 or len(text)
+    return end
+
+
+# Function to decode a file incrementally into sentence-aligned text chunks
+def iter_text_chunks(source, block_size=BLOCK_SIZE, encoding="utf-8"):
+    decoder = codecs.getincrementaldecoder(encoding)()
+    pending = ""
+    for block in iter_blocks(source, block_size):
+        # The incremental decoder keeps incomplete multibyte characters for the next block
+        pending += decoder.decode(block)
+        cut = _chunk_boundary(pending)
+        if cut:
+            yield pending[:cut]
+            pending = pending[cut:]
+    pending += decoder.decode(b"", final=True)
+    if pending:
+        yield pending
+
+
+def _csv_input(source):
+    import pyarrow as pa
+    if isinstance(source, (str, os.PathLike)):
+        return source
+    if hasattr(source, "getbuffer"):
+        # Read straight from the upload's buffer, without copying it
+        return pa.BufferReader(pa.py_buffer(source.getbuffer()))
+    if hasattr(source, "seek"):
+        source.seek(0)
+    return source
+
+
+# Function to list a CSV file's columns and which of them hold text, judged from the first block
+def csv_columns(source, block_size=CSV_BLOCK_SIZE):
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    reader = pacsv.open_csv(_csv_input(source), read_options=pacsv.ReadOptions(block_size=block_size))
+    columns = [
+        (field.name, pa.types.is_string(field.type) or pa.types.is_large_string(field.type))
+        for field in reader.schema
+    ]
+    reader.close()
+    return columns
+
+
+# Function to stream the chosen columns of a CSV file as text chunks, one chunk per block of rows.
+# The columns of a row are joined with spaces and each row ends with a line break.
+def iter_csv_text_chunks(source, columns, block_size=CSV_BLOCK_SIZE):
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    columns = list(columns)
+    if not columns:
+        return
+    reader = pacsv.open_csv(
+        _csv_input(source),
+        read_options=pacsv.ReadOptions(block_size=block_size),
+        # Chosen columns are read as text as they are, whatever type they would be inferred as
+        convert_options=pacsv.ConvertOptions(
+            include_columns=columns,
+            column_types={column: pa.string() for column in columns},
+            strings_can_be_null=True,
+        ),
+    )
+    try:
+        for batch in reader:
+            if batch.num_rows == 0:
+                continue
+            # Join the columns of every row at once; missing values become empty strings
+            rows = pc.binary_join_element_wise(
+                *[batch.column(column) for column in columns], " ",
+                null_handling="replace", null_replacement="",
+            )
+            # Then join the rows of the block in one step, by viewing them as a single list
+            block = pa.ListArray.from_arrays(pa.array([0, len(rows)], pa.int32()), rows)
+            yield pc.binary_join(block, "\n")[0].as_py() + "\n"
+    finally:
+        reader.close()
@@ -0,0 +1,151 @@
+import contextlib
+import contextvars
+import json
+import logging
+import os
+import tempfile
+import threading
+import time
+import tracemalloc
+
+# Set CDAC_INSTRUMENT=1 to log the spans of every session, not only those with the panel turned on
+ALWAYS_LOG = os.environ.get("CDAC_INSTRUMENT", "").lower() in ("1", "true", "yes")
+
+# Where span records are written, one JSON object per line
+LOG_PATH = os.environ.get("CDAC_INSTRUMENT_LOG", os.path.join(tempfile.gettempdir(), "cdac-app-spans.jsonl"))
+
+_logger = logging.getLogger("cdac.instrument")
+_logger_lock = threading.Lock()
+
+# The collection the current run's spans are added to, and the spans open in it
+_collection = contextvars.ContextVar("instrument_collection", default=None)
+_open_spans = contextvars.ContextVar("instrument_open_spans", default=())
+
+# tracemalloc and its peak are process-wide, so only one run at a time traces memory
+_memory_lock = threading.Lock()
+
+
+def _log():
+    # The JSON log handler is attached on first use
+    with _logger_lock:
+        if not _logger.handlers:
+            handler = logging.FileHandler(LOG_PATH, encoding="utf-8")
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            _logger.addHandler(handler)
+            _logger.setLevel(logging.INFO)
+            _logger.propagate = False
+    return _logger
+
+
+class _Collection:
+    def __init__(self, name, log, memory=False):
+        self.name = name
+        self.log = log
+        self.memory = memory
+        self.records = []
+
+
+@contextlib.contextmanager
+def span(name, **fields):
+    """Time a stage of work, and trace its memory when the run tracks memory.
+
+    Spans only record anything inside ``collect()`` or when CDAC_INSTRUMENT
+    is set; otherwise they cost two clock reads. Nested spans are recorded
+    with their depth, so the breakdown reads as a tree. Memory is only
+    traced in runs collected with ``memory=True``.
+    """
+    collection = _collection.get()
+    if collection is None and not ALWAYS_LOG:
+        yield
+        return
+
+    parents = _open_spans.get()
+    # Spans of other runs leave the peak alone, so they do not reset it under a memory-tracked run
+    tracing = collection is not None and collection.memory and tracemalloc.is_tracing()
+    entry = {"name": name, "peak": 0}
+    if tracing:
+        current, peak = tracemalloc.get_traced_memory()
+        # The peak so far belongs to the enclosing span; this span measures its own from here
+        if parents:
+            parents[-1]["peak"] = max(parents[-1]["peak"], peak)
+        tracemalloc.reset_peak()
+        entry["start_bytes"] = current
+    token = _open_spans.set(parents + (entry,))
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        _open_spans.reset(token)
+        record = {
+            "ts": time.time(),
+            "run": collection.name if collection else None,
+            "span": name,
+            "parent": parents[-1]["name"] if parents else None,
+            "depth": len(parents),
+            "seconds": round(seconds, 6),
+            "pid": os.getpid(),
+            "thread": threading.current_thread().name,
+        }
+        if tracing and tracemalloc.is_tracing():
+            current, peak = tracemalloc.get_traced_memory()
+            peak = max(peak, entry["peak"])
+            record["alloc_bytes"] = current - entry["start_bytes"]
+            record["peak_bytes"] = peak - entry["start_bytes"]
+            if parents:
+                parents[-1]["peak"] = max(parents[-1]["peak"], peak)
+        record.update(fields)
+        if collection is not None:
+            collection.records.append(record)
+        if ALWAYS_LOG or (collection is not None and collection.log):
+            _log().info(json.dumps(record, default=str))
+
+
+@contextlib.contextmanager
+def collect(name, enabled=True, memory=False, log=True):
+    """Collect the spans of one run (e.g. one button click) into a list of records.
+
+    With ``memory=True`` tracemalloc traces the run, which slows it down
+    noticeably; it is stopped again afterwards unless it was already on.
+    Memory-tracked runs wait for each other, as tracemalloc is shared by the
+    whole process; their peaks still include whatever other threads allocate
+    meanwhile. The records are also written to the JSON log when ``log`` is set.
+    """
+    if not enabled:
+        yield []
+        return
+    with _memory_lock if memory else contextlib.nullcontext():
+        collection = _Collection(name, log, memory)
+        token = _collection.set(collection)
+        started = memory and not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start()
+        try:
+            with span(name):
+                yield collection.records
+        finally:
+            if started:
+                tracemalloc.stop()
+            _collection.reset(token)
+
+
+# Function to show the records of a run as a table of stages, in the order they started
+def show_spans(records, container=None):
+    import pandas as pd
+    import streamlit as st
+    container = container or st.sidebar
+    if not records:
+        return
+    # Records are written as spans end, so the enclosing run comes last
+    total = max(record["seconds"] for record in records) or 1.0
+    ordered = sorted(records, key=lambda record: record["ts"] - record["seconds"])
+    table = pd.DataFrame({
+        "Stage": ["· " * record["depth"] + record["span"] for record in ordered],
+        "Seconds": [round(record["seconds"], 3) for record in ordered],
+        "% of run": [round(100 * record["seconds"] / total, 1) for record in ordered],
+    })
+    if any("peak_bytes" in record for record in ordered):
+        table["Peak MB"] = [round(record.get("peak_bytes", 0) / 2 ** 20, 1) for record in ordered]
+        table["Kept MB"] = [round(record.get("alloc_bytes", 0) / 2 ** 20, 1) for record in ordered]
+    container.dataframe(table, hide_index=True, use_container_width=True)
+    container.caption(f"Also written to {LOG_PATH}")
@@ -0,0 +1,155 @@
+import functools
+import itertools
+import threading
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from cachetools import LRUCache
+from instrument import collect
+from segments import Cancelled
+
+# Analyses running at the same time; more are queued
+JOB_WORKERS = 4
+
+# Number of jobs remembered (finished or not), shared by every Streamlit session
+JOB_HISTORY_SIZE = 32
+
+# Job states
+PENDING, RUNNING, DONE, FAILED, CANCELLED = "pending", "running", "done", "failed", "cancelled"
+
+_executor = None
+_jobs = LRUCache(maxsize=JOB_HISTORY_SIZE)
+_jobs_lock = threading.Lock()
+_ids = itertools.count(1)
+
+
+class JobCancelled(Cancelled):
+    pass
+
+
+class Job:
+    """A long analysis running in the background, made of named steps.
+
+    ``steps`` is a list of ``(label, callable)`` pairs run in order. Each
+    callable gets the job's cancel event and a function reporting how much
+    of the step is done (0 to 1); long steps pass them on to per_segment(),
+    so a cancellation takes effect and progress advances between batches.
+    Otherwise both happen between steps. Work already done (e.g. cached
+    document stages and segments) is kept.
+    The steps and their result are dropped once the job finishes, and the
+    object they work on (``target``) is only referred to weakly, so
+    remembered jobs do not keep documents in memory. ``log`` and ``memory``
+    are passed to the ``collect()`` that records the job's spans.
+    """
+
+    def __init__(self, key, name, steps, target=None, log=False, memory=False):
+        self.id = next(_ids)
+        self.key = key
+        self.name = name
+        self.status = PENDING
+        self.progress = 0.0
+        self.message = "Waiting to start"
+        self.result = None
+        self.error = None
+        self.spans = []
+        self.submitted_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self._steps = steps
+        self._target = weakref.ref(target) if target is not None else None
+        self._log = log
+        self._memory = memory
+        self._cancel = threading.Event()
+        self._future = None
+
+    @property
+    def finished(self):
+        return self.status in (DONE, FAILED, CANCELLED)
+
+    @property
+    def target(self):
+        # The object the steps worked on, or None once nothing else refers to it
+        return self._target() if self._target is not None else None
+
+    @property
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.time()) - self.started_at
+
+    def cancel(self):
+        self._cancel.set()
+        # A job that has not started yet is dropped from the queue right away
+        if self._future is not None and self._future.cancel():
+            self._finish(CANCELLED, "Cancelled")
+
+    def _finish(self, status, message):
+        # The steps close over the document; it is freed once nothing else uses it
+        self._steps = []
+        self.result = None
+        self.status = status
+        self.message = message
+        self.finished_at = time.time()
+
+    def _report(self, index, total, fraction):
+        self.progress = (index + min(max(fraction, 0.0), 1.0)) / total
+
+    def _run(self):
+        self.status = RUNNING
+        self.started_at = time.time()
+        total = len(self._steps)
+        try:
+            # The job's stages are timed, so the UI can show where its time went
+            with collect(f"job.{self.name}", log=self._log, memory=self._memory) as self.spans:
+                for index, (label, step) in enumerate(self._steps):
+                    if self._cancel.is_set():
+                        raise JobCancelled()
+                    self.progress = index / total
+                    self.message = f"{label} (step {index + 1} of {total})"
+                    self.result = step(self._cancel, functools.partial(self._report, index, total))
+        except Cancelled:
+            self._finish(CANCELLED, "Cancelled")
+        except Exception as error:
+            # Without its traceback, whose frames would keep the document alive
+            self.error = error.with_traceback(None)
+            self._finish(FAILED, f"{type(error).__name__}: {error}")
+        else:
+            self.progress = 1.0
+            self._finish(DONE, "Done")
+
+
+def _get_executor():
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="cdac-job")
+    return _executor
+
+
+# Function to start a job, or return the one already started for the same key.
+# Finished, failed and cancelled jobs are returned as they are; restart=True starts the job afresh.
+# `target` is the object the steps work on, e.g. the document being analysed (see Job.target).
+# `log` and `memory` choose whether the job's spans go to the JSON log and trace memory (see instrument.collect).
+def submit(key, name, steps, restart=False, target=None, log=False, memory=False):
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is not None and not restart:
+            return job
+        if job is not None and not job.finished:
+            job.cancel()
+        job = Job(key, name, steps, target, log, memory)
+        job._future = _get_executor().submit(job._run)
+        _jobs[key] = job
+        return job
+
+
+# Function to look up the job started for a key, if it is still remembered
+def get_job(key):
+    with _jobs_lock:
+        return _jobs.get(key)
+
+
+# Function to list the remembered jobs, newest first
+def list_jobs():
+    with _jobs_lock:
+        jobs = list(_jobs.values())
+    return sorted(jobs, key=lambda job: job.submitted_at, reverse=True)
@@ -1,12 +1,12 @@
 # main.py
 
 import streamlit as st
-from p1 import get_scraped_content, create_excel_file
-from p2 import (
-    perform_tokenization, perform_pos_tagging, perform_lemmatization,
-    perform_word_frequency, perform_stopword_removal, perform_stemming,
-    perform_sentiment_analysis
-)
+from pool import MAX_WORKERS
+from export import EXPORT_FORMATS
+from viewer import show_job, show_paged_table, show_paged_text
+from instrument import collect, show_spans
+# The scraping and text mining modules (and the NLP and plotting libraries behind them)
+# are imported by the page that uses them, so the other pages start without them
 
 # Page Configurations
 # st.set_page_config(page_title="AI Text Mining & Web Scraping", layout="centered")
@@ -138,6 +138,10 @@ option = st.sidebar.radio(
     ['HomePage', 'Web Scraping', 'Text Mining']
 )
 
+# Optional breakdown of where the time (and memory) of the last scrape or analysis went
+show_timings = st.sidebar.checkbox("Show stage timings")
+track_memory = show_timings and st.sidebar.checkbox("Track memory (slower)")
+
 # Show Home Page if the 'Home' option is selected
 if option == 'Home':
     st.markdown("<h2 class='section-title'>Welcome to AI Text Mining & Web Scraping</h2>", unsafe_allow_html=True)
@@ -146,43 +150,212 @@ if option == 'Home':
 # Show Web Scraping Page
 elif option == 'Web Scraping':
     st.markdown("<h2 class='section-title'>Web Scraping Module</h2>", unsafe_allow_html=True)
+    from p1 import get_scraped_content, create_excel_file, scrape_urls, create_pages_excel_file
     
+    mode = st.radio("Scraping mode", ["Single URL", "Multiple URLs", "Crawl site"], horizontal=True)
+
     # URL input for scraping
-    url = st.text_input("Enter a URL to scrape", placeholder="https://example.com")
-    if st.button("Scrape"):
+    if mode == "Single URL":
+        url = st.text_input("Enter a URL to scrape", placeholder="https://example.com")
+    elif mode == "Multiple URLs":
+        urls_text = st.text_area("Enter URLs to scrape, one per line", placeholder="https://example.com")
+        urls = [line.strip() for line in urls_text.splitlines() if line.strip()]
+    else:
+        from crawler import CRAWL_DELAY, MAX_DEPTH, MAX_PAGES, OK, DUPLICATE, BLOCKED, FAILED, crawl
+        seed_url = st.text_input("Enter the URL to start crawling from", placeholder="https://example.com")
+        # Only links to the same site are followed, within these limits
+        max_depth = st.number_input("Link depth", min_value=0, max_value=10, value=MAX_DEPTH)
+        max_pages = st.number_input("Maximum pages", min_value=1, max_value=1000, value=MAX_PAGES)
+        crawl_delay = st.number_input(
+            "Seconds between requests", min_value=0.0, value=CRAWL_DELAY, step=0.5,
+            help="Used unless the site's robots.txt asks for a longer Crawl-delay"
+        )
+
+    if mode == "Multiple URLs" and st.button("Scrape All"):
+        if urls:
+            # Pages are fetched concurrently and reported as soon as each one finishes
+            progress = st.progress(0.0, text="Scraping...")
+            pages = []
+            with collect("web_scraping.scrape_all", enabled=show_timings, memory=track_memory) as spans:
+                for done, (page_url, title, paragraphs, error) in enumerate(scrape_urls(urls), start=1):
+                    progress.progress(done / len(set(urls)), text=f"Scraped {done} of {len(set(urls))} pages")
+                    if error:
+                        st.error(f"{page_url}: {error}")
+                        continue
+                    pages.append((page_url, title, paragraphs))
+                    st.write(f"Scraped {title} ({page_url}): {len(paragraphs)} paragraphs")
+            st.session_state["stage_spans"] = spans
+            # Kept across reruns so paging through the results does not scrape again
+            st.session_state["scraped_pages"] = pages
+        else:
+            st.error("Please enter at least one valid URL.")
+
+    if mode == "Crawl site" and st.button("Crawl"):
+        if seed_url:
+            progress = st.progress(0.0, text="Crawling...")
+            pages = []
+            counts = {OK: 0, DUPLICATE: 0, BLOCKED: 0}
+            with collect("web_scraping.crawl", enabled=show_timings, memory=track_memory) as spans:
+                try:
+                    for done, page in enumerate(crawl(seed_url, max_depth, max_pages, delay=crawl_delay), start=1):
+                        progress.progress(min(done / max_pages, 1.0), text=f"Crawled {done} URLs")
+                        if page.status in counts:
+                            counts[page.status] += 1
+                        if page.status == OK:
+                            pages.append((page.url, page.title, page.paragraphs))
+                            st.write(f"Scraped {page.title} ({page.url}): {len(page.paragraphs)} paragraphs")
+                        elif page.status == FAILED:
+                            st.error(f"{page.url}: {page.detail}")
+                except ValueError as e:
+                    st.error(str(e))
+            st.session_state["stage_spans"] = spans
+            st.info(
+                f"{counts[OK]} pages kept, {counts[DUPLICATE]} near-duplicates skipped, "
+                f"{counts[BLOCKED]} URLs disallowed by robots.txt"
+            )
+            # Shown and exported like the pages of "Multiple URLs"
+            st.session_state["scraped_pages"] = pages
+        else:
+            st.error("Please enter a valid URL.")
+
+    if mode in ("Multiple URLs", "Crawl site") and st.session_state.get("scraped_pages"):
+        pages = st.session_state["scraped_pages"]
+        # The workbook is only built when asked for, not on every page change or search
+        if st.button("Prepare download", key="scraped_pages_download"):
+            st.download_button(
+                label="Download all as Excel",
+                data=create_pages_excel_file(pages),
+                file_name="scraped_pages.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        page_index = st.selectbox(
+            "Scraped page", range(len(pages)), format_func=lambda i: f"{pages[i][1]} ({pages[i][0]})"
+        )
+        page_url, title, paragraphs = pages[page_index]
+        st.write(f"### Page Title: {title}")
+        show_paged_text(paragraphs, key="scraped_pages")
+
+    if mode == "Single URL" and st.button("Scrape"):
         if url:
-            title, paragraphs = get_scraped_content(url)
+            with collect("web_scraping.scrape", enabled=show_timings, memory=track_memory) as spans:
+                title, paragraphs = get_scraped_content(url)
+            st.session_state["stage_spans"] = spans
             if title and paragraphs:
-                # Option to download scraped data as Excel
-                excel_data = create_excel_file(title, paragraphs)
-                st.download_button(
-                    label="Download as Excel",
-                    data=excel_data,
-                    file_name="scraped_data.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
-                )
-                #Scrpaed data
-                st.write(f"### Page Title: {title}")
-                for para in paragraphs:
-                    st.write(para)
-                
+                # Kept across reruns so paging through the results does not scrape again
+                st.session_state["scraped_page"] = (title, paragraphs)
             else:
+                st.session_state.pop("scraped_page", None)
                 st.error("Failed to retrieve content from the URL.")
         else:
             st.error("Please enter a valid URL.")
 
+    if mode == "Single URL" and "scraped_page" in st.session_state:
+        title, paragraphs = st.session_state["scraped_page"]
+        # Option to download scraped data as Excel, built only when asked for
+        if st.button("Prepare download", key="scraped_page_download"):
+            st.download_button(
+                label="Download as Excel",
+                data=create_excel_file(title, paragraphs),
+                file_name="scraped_data.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        #Scrpaed data
+        st.write(f"### Page Title: {title}")
+        show_paged_text(paragraphs, key="scraped_page")
+
 # Show Text Mining Page
 elif option == 'Text Mining':
     st.markdown("<h2 class='section-title'>Text Mining Module</h2>", unsafe_allow_html=True)
+    from docstore import store_upload
+    from document import get_csv_columns, get_document_from_csv, get_document_from_file
+    from tokenizer import DEFAULT_TOKENIZER, TOKENIZERS
+    from p2 import (
+        perform_tokenization, perform_pos_tagging, perform_lemmatization,
+        perform_word_frequency, perform_stopword_removal, perform_stemming,
+        perform_sentiment_analysis, create_download_button, submit_analysis
+    )
     
     uploaded_file = st.file_uploader("Choose a text (.txt) or CSV (.csv) file", type=["txt", "csv"])
+    # Sessions share one stored copy of the same upload and keep a handle to it
+    stored_file = store_upload(st.session_state, uploaded_file)
     
-    if uploaded_file:
-        file_content = uploaded_file.read().decode("utf-8")
-        st.session_state["file_content"] = file_content
+    per_row = False
+    if uploaded_file and uploaded_file.name.lower().endswith(".csv"):
+        # Only the chosen columns are analysed; text columns are picked by default.
+        # The column list is read once per file, not on every rerun.
+        columns = get_csv_columns(stored_file)
+        text_columns = st.multiselect(
+            "Columns to analyse",
+            [name for name, _ in columns],
+            default=[name for name, is_text in columns if is_text],
+        )
+        # Each row can also be analysed as a document of its own, e.g. one review per row
+        per_row = st.radio("Analysis mode", ["Whole file", "Per row"], horizontal=True) == "Per row"
+        if not text_columns:
+            st.session_state.pop("file_content", None)
+            st.warning("Choose at least one column to analyse.")
+        elif per_row:
+            st.session_state.pop("file_content", None)
+        else:
+            st.session_state["file_content"] = get_document_from_csv(stored_file, text_columns)
+            st.success("File uploaded successfully!")
+    elif uploaded_file:
+        # The upload is decoded in chunks by the analyses instead of being copied into one string
+        st.session_state["file_content"] = get_document_from_file(stored_file)
         st.success("File uploaded successfully!")
 
     # Display buttons after the file is uploaded
+    # Number of processes used by POS tagging and word counting; 1 keeps them in the script thread
+    workers = st.sidebar.number_input(
+        "Worker processes", min_value=1, max_value=MAX_WORKERS, value=1
+    )
+    # Interactive charts are drawn in the browser instead of being rendered to images on the server
+    native_charts = st.sidebar.checkbox("Interactive charts")
+    # Both engines give the same tokens; the fast one does it in a single regex pass per sentence
+    tokenizer = st.sidebar.selectbox(
+        "Tokenizer", TOKENIZERS, index=TOKENIZERS.index(DEFAULT_TOKENIZER),
+        format_func={"fast": "Fast", "treebank": "NLTK Treebank"}.get,
+    )
+
+    if per_row and text_columns:
+        from batch import DATE_PERIODS, RESULT_COLUMNS, aggregate_rows, analyse_rows, read_rows
+        from charts import show_chart
+        from resources import get_stopwords
+
+        # Results are kept for the file and columns they were computed from
+        batch_key = (stored_file.digest, tuple(text_columns))
+        remove_stopwords = st.checkbox("Leave stopwords out of the top terms", value=True)
+        if st.button("Analyse rows"):
+            stop_words = get_stopwords("english") if remove_stopwords else None
+            with st.spinner("Analysing rows..."), \
+                    collect("text_mining.per_row", enabled=show_timings, memory=track_memory) as spans:
+                results = analyse_rows(read_rows(stored_file), text_columns, workers=workers, stop_words=stop_words,
+                                       tokenizer=tokenizer)
+            st.session_state["stage_spans"] = spans
+            st.session_state["batch_results"] = (batch_key, results)
+
+        if st.session_state.get("batch_results", (None,))[0] == batch_key:
+            results = st.session_state["batch_results"][1]
+            st.subheader("Per-row Analysis:")
+            show_paged_table(results, key="batch_results")
+
+            # Summary of the rows grouped by one of the original columns, e.g. the rating or the date
+            group_columns = [column for column in results.columns if column not in RESULT_COLUMNS]
+            if group_columns:
+                by_col, period_col = st.columns(2)
+                group_by = by_col.selectbox("Summarise by", group_columns)
+                period = period_col.selectbox("Group dates by", ["Not a date"] + list(DATE_PERIODS))
+                summary = aggregate_rows(results, group_by, DATE_PERIODS.get(period))
+                st.dataframe(summary, use_container_width=True)
+                show_chart("bar", summary[group_by], summary["Mean Polarity"], native=native_charts,
+                           title=f"Mean Polarity by {group_by}", xlabel=group_by, ylabel="Mean Polarity")
+
+            export_format = st.selectbox("Download format", list(EXPORT_FORMATS), key="batch_format")
+            if st.button("Prepare download", key="batch_download"):
+                create_download_button(
+                    results, "per_row_analysis_output", f"Download Per-row Analysis as {export_format}", export_format
+                )
+
     buttons = ["Tokenization", "POS Tagging", "Lemmatization", "Word Frequency", "Stopword Removal", "Stemming", "Sentiment Analysis"]
 
     if 'file_content' in st.session_state:
@@ -199,42 +372,75 @@ elif option == 'Text Mining':
     output_placeholder = st.empty()
 
     # Perform the selected action and update the placeholder dynamically
-    if 'selected_action' in st.session_state:
+    if 'selected_action' in st.session_state and 'file_content' in st.session_state:
         action = st.session_state.selected_action
+        file_content = st.session_state["file_content"]
         st.session_state.selected_action = action  # Ensure the action stays in session state
 
-        with output_placeholder.container():  # Use the container to update dynamically
-            if action == "Tokenization":
-                result = perform_tokenization(file_content)
-                st.subheader("Tokenized Text:")
-                st.write(result)
-
-            elif action == "POS Tagging":
-                result = perform_pos_tagging(file_content)
-                st.subheader("POS Tagged Text:")
-                st.write(result)
-
-            elif action == "Lemmatization":
-                result = perform_lemmatization(file_content)
-                st.subheader("Lemmatized Text:")
-                st.write(result)
-
-            elif action == "Word Frequency":
-                result = perform_word_frequency(file_content)
-                st.subheader("Word Frequency Analysis:")
-                st.write(result)
-
-            elif action == "Stopword Removal":
-                result = perform_stopword_removal(file_content)
-                st.subheader("Text After Stopword Removal:")
-                st.write(result)
-
-            elif action == "Stemming":
-                result = perform_stemming(file_content)
-                st.subheader("Stemmed Text:")
-                st.write(result)
-
-            elif action == "Sentiment Analysis":
-                result = perform_sentiment_analysis(file_content)
-                # st.subheader("Sentiment Analysis Results:")
-                st.write(result)
+        # Word Frequency options are chosen before the counts are computed
+        lowercase = remove_stopwords = False
+        if action == "Word Frequency":
+            top = st.number_input("Number of top words", min_value=1, max_value=100, value=10)
+            lowercase = st.checkbox("Ignore case")
+            remove_stopwords = st.checkbox("Remove stopwords")
+            full_table = st.checkbox("Show full frequency table")
+
+        # The heavy part runs as a background job: it keeps going across reruns, can be cancelled,
+        # and a finished job is picked up instead of being computed again
+        restart = st.session_state.pop(f"job_{action}_restart", False)
+        # The job's stages go to the JSON log and are memory-tracked like the rest of the run
+        job = submit_analysis(file_content, action, workers, lowercase, remove_stopwords, restart=restart,
+                              tokenizer=tokenizer, log=show_timings, memory=track_memory)
+        if show_job(job, key=f"job_{action}"):
+            # Use the container to update dynamically; the stages of the action are timed when asked for
+            with output_placeholder.container(), \
+                    collect(f"text_mining.{action}", enabled=show_timings, memory=track_memory) as spans:
+                if action == "Tokenization":
+                    result = perform_tokenization(file_content)
+                    st.subheader("Tokenized Text:")
+
+                elif action == "POS Tagging":
+                    result = perform_pos_tagging(file_content, workers=workers, native_charts=native_charts)
+                    st.subheader("POS Tagged Text:")
+
+                elif action == "Lemmatization":
+                    result = perform_lemmatization(file_content)
+                    st.subheader("Lemmatized Text:")
+
+                elif action == "Word Frequency":
+                    result = perform_word_frequency(
+                        file_content, top=top, lowercase=lowercase, remove_stopwords=remove_stopwords,
+                        full_table=full_table, workers=workers, native_charts=native_charts
+                    )
+                    st.subheader("Word Frequency Analysis:")
+
+                elif action == "Stopword Removal":
+                    result = perform_stopword_removal(file_content)
+                    st.subheader("Text After Stopword Removal:")
+
+                elif action == "Stemming":
+                    result = perform_stemming(file_content)
+                    st.subheader("Stemmed Text:")
+
+                elif action == "Sentiment Analysis":
+                    result = perform_sentiment_analysis(file_content, native_charts=native_charts)
+                    # st.subheader("Sentiment Analysis Results:")
+
+                # Only the visible page of the result is sent to the browser
+                show_paged_table(result, key=action)
+
+                # Option to download the result; large results are better served as CSV or Parquet
+                export_format = st.selectbox("Download format", list(EXPORT_FORMATS))
+                if st.button("Prepare download"):
+                    create_download_button(
+                        result,
+                        f"{action.lower().replace(' ', '_')}_output",
+                        f"Download {action} Data as {export_format}",
+                        export_format
+                    )
+            st.session_state["stage_spans"] = job.spans + spans
+
+# The stage breakdown of the last scrape or analysis of this session
+if show_timings and st.session_state.get("stage_spans"):
+    with st.sidebar.expander("Stage timings", expanded=True):
+        show_spans(st.session_state["stage_spans"], container=st)
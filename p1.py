@@ -1,9 +1,35 @@
-from turtle import st
 import requests
+import streamlit as st
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-import pandas as pd
-from io import BytesIO
+from lxml import etree
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from urllib.parse import urljoin, urlsplit
+import contextvars
+import hashlib
+import threading
 import os
+from http_cache import get_http_cache
+from export import export_rows, read_export
+from instrument import span
+
+# Settings for fetching pages
+REQUEST_TIMEOUT = 10  # seconds, for connecting and for each read
+MAX_RETRIES = 3
+BACKOFF_FACTOR = 0.5  # waits 0.5s, 1s, 2s, ... between retries
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+MAX_WORKERS = 8
+PER_HOST_LIMIT = 4  # concurrent requests to the same host
+
+# Engine used to extract pages: "html.parser" parses the page with BeautifulSoup, as it always has.
+# "lxml" streams the page through lxml's pull parser, which is much faster and lighter but closes
+# a <p> at the first block element inside it, as browsers do; set CDAC_PARSER=lxml to use it anyway.
+PARSER_ENGINE = os.environ.get("CDAC_PARSER", "html.parser")
+FEED_SIZE = 64 * 1024  # characters handed to the lxml parser at a time
+
+_session = None
+_session_lock = threading.Lock()
 
 # Function to load the CSS file
 def load_css():
@@ -14,21 +40,191 @@ def load_css():
     else:
         st.error("CSS file not found!")
     
-def get_scraped_content(url):
-    response = requests.get(url)
+# Function to create a session with pooled keep-alive connections and retry with backoff
+def create_session(pool_size=MAX_WORKERS, retries=MAX_RETRIES, backoff_factor=BACKOFF_FACTOR):
+    retry = Retry(
+        total=retries, backoff_factor=backoff_factor,
+        status_forcelist=RETRY_STATUSES, allowed_methods=("GET", "HEAD"),
+        raise_on_status=False,
+    )
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retry)
+    session = requests.Session()
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+# Function to get the session shared by all scrapes in this process
+def get_session():
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = create_session()
+        return _session
+
+
+# Function to collect the text of an element like BeautifulSoup's get_text(),
+# leaving out comments and the contents of <script> and <style>
+def _element_text(element, parts):
+    if isinstance(element.tag, str) and element.tag not in ("script", "style"):
+        if element.text:
+            parts.append(element.text)
+        for child in element:
+            _element_text(child, parts)
+            if child.tail:
+                parts.append(child.tail)
+    return parts
+
+
+# Function to extract the title and paragraphs incrementally with lxml.
+# Finished paragraphs are cleared and dropped from the tree, so the whole DOM is never built.
+def _parse_content_lxml(html, links=None):
+    tags = ("title", "p", "a") if links is not None else ("title", "p")
+    parser = etree.HTMLPullParser(events=("start", "end"), tag=tags)
+    title = "No title"
+    title_found = False
+    paragraphs = []
+    open_paragraphs = []
+
+    def handle_events():
+        nonlocal title, title_found
+        for event, element in parser.read_events():
+            if element.tag == "title":
+                if event == "end" and not title_found:
+                    title = element.text
+                    title_found = True
+            elif element.tag == "a":
+                if event == "start" and element.get("href"):
+                    links.append(element.get("href"))
+                elif event == "end" and not open_paragraphs:
+                    # Links outside paragraphs are not kept in the tree either
+                    element.clear(keep_tail=True)
+            elif event == "start":
+                # Reserve the paragraph's slot so nested paragraphs keep document order
+                open_paragraphs.append(len(paragraphs))
+                paragraphs.append(None)
+            else:
+                paragraphs[open_paragraphs.pop()] = "".join(_element_text(element, []))
+                if not open_paragraphs:
+                    element.clear(keep_tail=True)
+                    while element.getprevious() is not None:
+                        del element.getparent()[0]
+
+    for start in range(0, len(html), FEED_SIZE):
+        parser.feed(html[start:start + FEED_SIZE])
+        handle_events()
+    try:
+        parser.close()
+    except etree.XMLSyntaxError:
+        # Raised for pages without any element; there is nothing to extract then
+        pass
+    # Elements left open at the end of the page are closed by close()
+    handle_events()
+    return title, paragraphs
+
+
+# Function to extract the title and paragraphs from a page.
+# When a `links` list is given, the href of every <a> element is appended to it as well.
+def parse_content(html, engine=PARSER_ENGINE, links=None):
+    if engine == "lxml":
+        return _parse_content_lxml(html, links)
+    # The whole tree is built: with only some elements kept (SoupStrainer), end tags of the others
+    # no longer close them, and malformed pages give other paragraphs
+    soup = BeautifulSoup(html, 'html.parser')
+    title = soup.title.string if soup.title else "No title"
+    paragraphs = [p.get_text() for p in soup.find_all('p')]
+    if links is not None:
+        links.extend(a["href"] for a in soup.find_all("a", href=True))
+    return title, paragraphs
+
+
+# Function to scrape a page, revalidating the cached copy (cache=False skips the cache).
+# With links=True the page's links, resolved to absolute URLs, are returned as a third item.
+def get_scraped_content(url, session=None, timeout=REQUEST_TIMEOUT, cache=None, links=False):
+    with span("scrape", url=url):
+        return _get_scraped_content(url, session, timeout, cache, links)
+
+
+def _get_scraped_content(url, session, timeout, cache, links=False):
+    if cache is None:
+        cache = get_http_cache()
+    # Results with links are cached apart from the plain ones, under a key that is not a URL
+    key = f"links {url}" if links else url
+    with span("scrape.cache_lookup"):
+        entry = cache.get(key) if cache else None
+    headers = {}
+    if entry and entry["etag"]:
+        headers["If-None-Match"] = entry["etag"]
+    if entry and entry["last_modified"]:
+        headers["If-Modified-Since"] = entry["last_modified"]
+
+    with span("scrape.fetch"):
+        response = (session or get_session()).get(url, timeout=timeout, headers=headers)
+    if response.status_code == 304 and entry:
+        # Unchanged page: nothing was downloaded, and nothing needs parsing unless the engine changed
+        if entry.get("parser") == PARSER_ENGINE:
+            return entry["result"]
+        result = _parse_response(entry["body"].decode(response.encoding or "utf-8", "replace"), response.url, links)
+        cache.put(key, entry["body"], entry["etag"], entry["last_modified"], result, PARSER_ENGINE)
+        return result
     if response.status_code == 200:
-        soup = BeautifulSoup(response.text, 'html.parser')
-        title = soup.title.string if soup.title else "No title"
-        paragraphs = [p.get_text() for p in soup.find_all('p')]
-        return title, paragraphs
+        etag = response.headers.get("ETag")
+        last_modified = response.headers.get("Last-Modified")
+        if entry and entry.get("parser") == PARSER_ENGINE \
+                and entry["body_hash"] == hashlib.sha256(response.content).hexdigest():
+            # Servers without validators still skip the parsing when the body is unchanged
+            if (etag, last_modified) != (entry["etag"], entry["last_modified"]):
+                cache.put(key, response.content, etag, last_modified, entry["result"], PARSER_ENGINE)
+            return entry["result"]
+        result = _parse_response(response.text, response.url, links)
+        if cache:
+            with span("scrape.cache_store"):
+                cache.put(key, response.content, etag, last_modified, result, PARSER_ENGINE)
+        return result
     else:
-        return None, None
+        return (None, None, None) if links else (None, None)
+
+
+def _parse_response(html, url, links):
+    with span("scrape.parse", bytes=len(html)):
+        if not links:
+            return parse_content(html)
+        hrefs = []
+        title, paragraphs = parse_content(html, links=hrefs)
+        # Relative links are resolved against the final URL, after any redirect
+        return title, paragraphs, [urljoin(url, href) for href in hrefs]
+
+
+# Function to scrape many URLs concurrently, yielding (url, title, paragraphs, error) as each page finishes
+def scrape_urls(urls, max_workers=MAX_WORKERS, per_host=PER_HOST_LIMIT, timeout=REQUEST_TIMEOUT, session=None):
+    session = session or get_session()
+    host_limits = {}
+    for url in urls:
+        host_limits.setdefault(urlsplit(url).netloc, threading.Semaphore(per_host))
+
+    def scrape(url):
+        with host_limits[urlsplit(url).netloc]:
+            try:
+                title, paragraphs = get_scraped_content(url, session=session, timeout=timeout)
+            except requests.RequestException as e:
+                return url, None, None, str(e)
+        if title is None and paragraphs is None:
+            return url, None, None, "Failed to retrieve content from the URL."
+        return url, title, paragraphs, None
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Each task runs in a copy of the caller's context, so its spans join the caller's run
+        futures = [executor.submit(contextvars.copy_context().run, scrape, url) for url in dict.fromkeys(urls)]
+        for future in as_completed(futures):
+            yield future.result()
 
 def create_excel_file(title, content):
-    df = pd.DataFrame(content, columns=["Content"])
-    df["Title"] = title
-    output = BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False)
-    output.seek(0)
-    return output.getvalue()
+    # Rows are streamed to a temporary xlsx file instead of going through a DataFrame
+    with span("export.excel", rows=len(content)):
+        return read_export(export_rows(["Content", "Title"], ((para, title) for para in content)))
+
+# Function to create one Excel file from several scraped pages
+def create_pages_excel_file(pages):
+    rows = ((url, title, para) for url, title, paragraphs in pages for para in paragraphs)
+    with span("export.excel"):
+        return read_export(export_rows(["URL", "Title", "Content"], rows))
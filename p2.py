@@ -1,36 +1,105 @@
-from typing_extensions import Buffer
-import nltk
-import re
-import io
-from nltk.tokenize import word_tokenize
-from nltk.corpus import stopwords
-from nltk.stem import PorterStemmer
-from nltk.tokenize import sent_tokenize
-from textblob import TextBlob
+import os
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import streamlit as st
-# Make sure to download necessary NLTK datasets (first-time usage)
-nltk.download('punkt')
-nltk.download('stopwords')
-
-def create_download_button(df, file_name, button_label):
-    # Convert the DataFrame to an Excel buffer
-    buffer = io.BytesIO()
-    with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-        df.to_excel(writer, index=False, sheet_name='Sheet1')
-        writer.save()
-        
-    buffer.seek(0)
-
-    # Create a download button in Streamlit
-    st.download_button(
-        label=button_label,
-        data=buffer,
-        file_name=file_name,
-        mime='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
-    )
+from document import get_document
+from frequency import top_k
+from export import EXPORT_FORMATS, export_dataframe
+from resources import get_stopwords
+from tokenizer import DEFAULT_TOKENIZER
+from charts import show_chart
+from instrument import span
+import jobs
+# NLTK data is looked up (and fetched if missing) on first use, see resources.py.
+# Charts are drawn by charts.py from aggregated counts; matplotlib is only loaded when one is rendered.
+
+def create_download_button(df, file_name, button_label, fmt="Excel"):
+    # The export is streamed to a temporary file on disk instead of an in-memory buffer
+    extension, mime = EXPORT_FORMATS[fmt]
+    path = export_dataframe(df, fmt)
+    try:
+        with open(path, "rb") as f:
+            # Create a download button in Streamlit
+            st.download_button(
+                label=button_label,
+                data=f,
+                file_name=os.path.splitext(file_name)[0] + extension,
+                mime=mime
+            )
+    finally:
+        os.remove(path)
+
+# Function to list the document stages an analysis needs, as (label, callable) steps for a background job.
+# Each step gets the job's cancel event and progress callback (see jobs.Job).
+def analysis_steps(text, action, workers=1, lowercase=False, remove_stopwords=False, tokenizer=DEFAULT_TOKENIZER):
+    document = get_document(text)
+
+    def tokenize(cancel, progress):
+        return document.tokenize(tokenizer, workers, cancel)
+
+    def per_sentence(progress):
+        # Stages computed segment by segment report the share of the document's sentences done;
+        # the sentences were split by an earlier step
+        total = max(len(document.sentences), 1)
+        return lambda done: progress(done / total)
+
+    steps = {
+        "Tokenization": [
+            ("Tokenizing", tokenize),
+            ("Collecting word types", lambda cancel, progress: document.token_column),
+        ],
+        "POS Tagging": [
+            ("Splitting sentences", lambda cancel, progress: document.sentences),
+            ("Tokenizing", lambda cancel, progress: document.tokenize(
+                tokenizer, workers, cancel, per_sentence(progress)
+            )),
+            ("Tagging parts of speech", lambda cancel, progress: document.tag_column(
+                workers, cancel, per_sentence(progress)
+            )),
+        ],
+        "Lemmatization": [
+            ("Tokenizing", tokenize),
+            ("Collecting word types", lambda cancel, progress: document.vocabulary),
+            ("Lemmatizing", lambda cancel, progress: document.lemmas),
+        ],
+        "Word Frequency": [
+            ("Counting words", lambda cancel, progress: document.word_counts(
+                lowercase, get_stopwords("english") if remove_stopwords else None, workers, tokenizer
+            )),
+        ],
+        "Stopword Removal": [
+            ("Loading stopwords", lambda cancel, progress: get_stopwords("english")),
+            ("Tokenizing", tokenize),
+            ("Collecting word types", lambda cancel, progress: document.token_column),
+        ],
+        "Stemming": [
+            ("Tokenizing", tokenize),
+            ("Collecting word types", lambda cancel, progress: document.vocabulary),
+            ("Stemming", lambda cancel, progress: document.stems),
+        ],
+        "Sentiment Analysis": [
+            ("Splitting sentences", lambda cancel, progress: document.sentences),
+            ("Scoring sentences", lambda cancel, progress: document.score(cancel, per_sentence(progress))),
+        ],
+    }
+    return document, steps[action]
+
+
+# Function to run the heavy part of an analysis in the background.
+# The job only fills the document's cached stages; the perform_* function then builds the result from them.
+# Jobs are shared by key, so a rerun (or another session on the same file) picks up the running or finished one.
+# The tokenizer engine is not part of the key: both engines give the same tokens.
+# `log` and `memory` are the session's timing settings, applied to the job's stages.
+def submit_analysis(text, action, workers=1, lowercase=False, remove_stopwords=False, restart=False,
+                    tokenizer=DEFAULT_TOKENIZER, log=False, memory=False):
+    document, steps = analysis_steps(text, action, workers, lowercase, remove_stopwords, tokenizer)
+    key = (document.key, action, lowercase, remove_stopwords)
+    job = jobs.get_job(key)
+    # A finished job filled the stages of its own document; once the document cache has dropped that one,
+    # the document now in use has none of them, so the job is run again for it
+    if job is not None and job.status == jobs.DONE and job.target is not document:
+        restart = True
+    return jobs.submit(key, action, steps, restart=restart, target=document, log=log, memory=memory)
+
 
 # POS tag abbreviations and their full forms
 pos_abbreviations = {
@@ -74,22 +143,26 @@ pos_abbreviations = {
 
 # Function for Tokenization
 def perform_tokenization(text):
-    # Tokenizes the input text into individual words
-    tokens = word_tokenize(text)
-    tokenized_df = pd.DataFrame(tokens, columns=["Tokens"])
+    # Tokenizes the input text into individual words.
+    # Columns are categorical over the document's vocabulary; strings are only built when shown or exported.
+    tokens = get_document(text).token_column
+    with span("p2.dataframe"):
+        tokenized_df = pd.DataFrame({"Tokens": tokens})
     return tokenized_df
     create_download_button(tokenized_df, "tokenized_output.xlsx", "Download Tokenized Data as Excel")
 
 
 # Function for POS Tagging
-def perform_pos_tagging(text):
-    # Tokenizes the input text and tags each word with its part of speech
-    tokens = word_tokenize(text)
-    tagged = nltk.pos_tag(tokens)
+def perform_pos_tagging(text, workers=1, native_charts=False):
+    # Tokenizes the input text and tags each word with its part of speech,
+    # spreading the sentences over `workers` processes when more than one is given
+    document = get_document(text)
+    tags = document.tag_column(workers)
 
     
     # Convert to DataFrame for better visual presentation
-    tagged_df = pd.DataFrame(tagged, columns=["Word", "POS"])
+    with span("p2.dataframe"):
+        tagged_df = pd.DataFrame({"Word": document.token_column, "POS": tags})
     
     # Display the full form of each POS tag abbreviation
     pos_info = "\n".join([f"{key}: {value}" for key, value in pos_abbreviations.items()])
@@ -105,10 +178,8 @@ def perform_pos_tagging(text):
     # Plot the distribution as a pie chart
     st.text_area("Pie Chart Distribution of Top 10 POS: ", height=30)
 
-    fig, ax = plt.subplots(figsize=(8, 8))
-    ax.pie(top_10_pos_counts, labels=top_10_pos_counts.index, autopct='%1.1f%%', startangle=90, colors=sns.color_palette("Set3", len(top_10_pos_counts)))
-    ax.axis('equal')  # Equal aspect ratio ensures that pie chart is drawn as a circle.
-    st.pyplot(fig)
+    show_chart("pie", top_10_pos_counts.index, top_10_pos_counts.to_numpy(), native=native_charts,
+               palette="Set3", figsize=(8, 8))
 
     return tagged_df
     create_download_button(tagged_df, "pos_tagged_output.xlsx", "Download POS-Tagged Data as Excel")
@@ -117,87 +188,85 @@ def perform_pos_tagging(text):
 # Function for Lemmatization
 def perform_lemmatization(text):
     # Lemmatizes the input text by reducing words to their root form
-    lemmatizer = nltk.WordNetLemmatizer()
-    tokens = word_tokenize(text)
-    lemmatized = [lemmatizer.lemmatize(word) for word in tokens]
-    lemmatized_df = pd.DataFrame({"Original Word": tokens, "Lemmatized Word": lemmatized})
+    document = get_document(text)
+    tokens = document.token_column
+    lemmatized = document.lemmas
+    with span("p2.dataframe"):
+        lemmatized_df = pd.DataFrame({"Original Word": tokens, "Lemmatized Word": lemmatized})
     return lemmatized_df
     create_download_button(lemmatized_df, "lemmatized_output.xlsx", "Download Lemmatized Data as Excel")
 
 # Function for Word Frequency
-def perform_word_frequency(text):
-    # Tokenizes the input text and calculates the frequency distribution of words
-    tokens = word_tokenize(text)
-    frequency = nltk.FreqDist(tokens)
-    # Convert frequency distribution to a DataFrame for plotting
-    freq_df = pd.DataFrame(frequency.items(), columns=["Word", "Frequency"])
-    # Plotting the word frequency as a bar chart
-    plt.figure(figsize=(10, 6))
-    sns.barplot(x="Word", y="Frequency", data=freq_df.sort_values(by="Frequency", ascending=False).head(10))
-    plt.title("Top 10 Word Frequency")
-    plt.xticks(rotation=45)
-    plt.show()
-    return freq_df
+def perform_word_frequency(text, top=10, lowercase=False, remove_stopwords=False, full_table=False, workers=1,
+                           native_charts=False):
+    # Counts the words of the input text, optionally case-folded and without stopwords
+    stop_words = get_stopwords("english") if remove_stopwords else None
+    frequency = get_document(text).word_counts(lowercase, stop_words, workers)
+
+    # Only the top words are picked for the chart, without sorting the whole table
+    with span("p2.top_k"):
+        top_df = pd.DataFrame(top_k(frequency, top), columns=["Word", "Frequency"])
+    show_chart("bar", top_df["Word"], top_df["Frequency"], native=native_charts,
+               title=f"Top {top} Word Frequency", xlabel="Word", ylabel="Frequency", rotation=45, figsize=(10, 6))
+
+    if not full_table:
+        return top_df
+    # The full table is only built when it is asked for
+    with span("p2.dataframe"):
+        freq_df = pd.DataFrame(frequency.items(), columns=["Word", "Frequency"])
+        return freq_df.sort_values(by="Frequency", ascending=False, ignore_index=True)
     create_download_button(freq_df, "word_frequency_output.xlsx", "Download Word Frequency Data as Excel")
 
 # Function for Stopword Removal
 def perform_stopword_removal(text):
     # Removes common stopwords like "the", "a", etc. from the text
-    stop_words = set(stopwords.words("english"))
-    tokens = word_tokenize(text)
-    filtered_words = [word for word in tokens if word.lower() not in stop_words]
+    stop_words = get_stopwords("english")
+    document = get_document(text)
+    _, types = document.vocabulary
+    # Each word type is checked once; stopwords are shown as empty strings
+    filtered = document.map_types([word if word.lower() not in stop_words else "" for word in types])
     
     # Create a pandas DataFrame with original words and filtered words
-    stopword_removal_df = pd.DataFrame({
-        "Original Word": tokens,
-        "Filtered Word": [word if word.lower() not in stop_words else "" for word in tokens] # Output as a space-separated string
-    })
+    with span("p2.dataframe"):
+        stopword_removal_df = pd.DataFrame({
+            "Original Word": document.token_column,
+            "Filtered Word": filtered
+        })
     return stopword_removal_df
     create_download_button(stopword_removal_df, "stopword_removal_output.xlsx", "Download Stopword Removal Data as Excel")
 
 # Function for Stemming
 def perform_stemming(text):
     # Reduces words to their stem (root) form using the Porter Stemmer
-    ps = PorterStemmer()
-    tokens = word_tokenize(text)
-    stemmed = [ps.stem(word) for word in tokens]
-    stemming_df = pd.DataFrame({
-        "Original Word": tokens,
-        "Stemmed Word": stemmed
-    })
+    document = get_document(text)
+    tokens = document.token_column
+    stemmed = document.stems
+    with span("p2.dataframe"):
+        stemming_df = pd.DataFrame({
+            "Original Word": tokens,
+            "Stemmed Word": stemmed
+        })
     return stemming_df
     create_download_button(stemming_df, "stemming_output.xlsx", "Download Stemming Data as Excel")
 
 # Function for Sentiment Analysis
-def perform_sentiment_analysis(text):
+def perform_sentiment_analysis(text, native_charts=False):
+    from sentiment import label_polarity
+
     st.subheader("Sentiment Analysis Result")
     
-    # Ensure the text is a string and tokenize into sentences
-    if isinstance(text, bytes):
-        text = text.decode("utf-8")  # If file was read as bytes, decode it to string
-    
-    sentences = sent_tokenize(text)  # Use NLTK's sent_tokenize to split into sentences
-    
+    # Sentences are split once per document and scored together in one batch
+    document = get_document(text)
+    sentences, polarity = document.sentences, document.polarity
+    with span("p2.dataframe"):
+        sentiment_df = pd.DataFrame({"Sentence": sentences, "Polarity": polarity})
+        sentiment_df["Sentiment"] = label_polarity(sentiment_df["Polarity"].to_numpy())
+
     # Sentiment counters
-    positive = 0
-    negative = 0
-    neutral = 0
-    
-    sentiment_labels = []
-    
-    # Analyze sentiment for each sentence
-    for sentence in sentences:
-        blob = TextBlob(sentence)  # Process each sentence individually
-        sentiment = blob.sentiment.polarity
-        if sentiment > 0:
-            positive += 1
-            sentiment_labels.append("Positive")
-        elif sentiment < 0:
-            negative += 1
-            sentiment_labels.append("Negative")
-        else:
-            neutral += 1
-            sentiment_labels.append("Neutral")
+    counts = sentiment_df["Sentiment"].value_counts()
+    positive = int(counts.get("Positive", 0))
+    negative = int(counts.get("Negative", 0))
+    neutral = int(counts.get("Neutral", 0))
     
     # Display sentiment counts
     st.write(f"Positive Sentences: {positive}")
@@ -209,24 +278,17 @@ def perform_sentiment_analysis(text):
     sizes = [positive, negative, neutral]
     colors = ['#4CAF50', '#F44336', '#FFC107']
     
-    fig, ax = plt.subplots()
-    ax.pie(sizes, labels=labels, colors=colors, autopct='%1.1f%%', startangle=90)
-    ax.axis('equal')  # Equal aspect ratio ensures that the pie is drawn as a circle.
-    st.pyplot(fig)
-    
-    # Countplot for sentiment categories
-    fig, ax = plt.subplots()
-    sns.countplot(x=sentiment_labels, palette=colors, ax=ax)
-    ax.set_title('Count of Sentiment Categories')
-    st.pyplot(fig)
+    show_chart("pie", labels, sizes, native=native_charts, colors=colors)
+
+    # Count of each sentiment category, drawn from the same counters
+    show_chart("bar", labels, sizes, native=native_charts, colors=colors, title="Count of Sentiment Categories")
+
+    return sentiment_df
 
 # Function for Word Cloud Generation (Optional extra)
 def generate_word_cloud(text):
     from wordcloud import WordCloud
-    # Generates a word cloud from the text
+    # Generates a word cloud from the text; it is shown as an image, without a matplotlib figure
     wordcloud = WordCloud(width=800, height=400, background_color='white').generate(text)
-    plt.figure(figsize=(10, 5))
-    plt.imshow(wordcloud, interpolation='bilinear')
-    plt.axis("off")
-    plt.show()
+    st.image(wordcloud.to_array())
     return wordcloud
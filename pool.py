@@ -0,0 +1,68 @@
+import os
+import threading
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+# Upper bound for the worker count offered in the UI, and the size of the shared pool
+MAX_WORKERS = os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+# Function to get the process pool shared by the parallel analyses. It is sized to MAX_WORKERS once and
+# never rebuilt; how many processes a call uses is set by how many of its tasks it keeps in flight.
+def get_process_pool():
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(max_workers=MAX_WORKERS)
+        return _pool
+
+
+# Function to run `fn` over the shared pool like Executor.map, with at most `workers` of this call's
+# tasks in flight at a time. Results come back in submission order.
+def pool_map(fn, *iterables, workers=MAX_WORKERS):
+    workers = max(1, min(workers, MAX_WORKERS))
+    pool = get_process_pool()
+    pending = deque()
+    try:
+        for args in zip(*iterables):
+            if len(pending) >= workers:
+                yield pending.popleft().result()
+            pending.append(pool.submit(fn, *args))
+        while pending:
+            yield pending.popleft().result()
+    finally:
+        # Tasks not started yet are dropped when the caller stops early or a task fails
+        for future in pending:
+            future.cancel()
+
+
+# Function to run `fn` over argument tuples on the shared pool, with at most `workers` tasks in flight.
+# Yields (args, future) pairs as the tasks finish, in any order; the caller gets each result or error.
+def pool_completed(fn, arg_tuples, workers=MAX_WORKERS):
+    workers = max(1, min(workers, MAX_WORKERS))
+    pool = get_process_pool()
+    arg_tuples = iter(arg_tuples)
+    pending = {}
+    try:
+        while True:
+            for args in arg_tuples:
+                pending[pool.submit(fn, *args)] = args
+                if len(pending) >= workers:
+                    break
+            if not pending:
+                return
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future
+    finally:
+        for future in pending:
+            future.cancel()
+
+
+# Function to split a list into about `workers * per_worker` consecutive batches
+def split_batches(items, workers, per_worker=4):
+    batch_size = max(1, -(-len(items) // (workers * per_worker)))
+    return [items[start:start + batch_size] for start in range(0, len(items), batch_size)]
@@ -0,0 +1,69 @@
+import functools
+import os
+import nltk
+from nltk.corpus import stopwords
+from nltk.stem import PorterStemmer, WordNetLemmatizer
+from nltk.tag.perceptron import PerceptronTagger
+from nltk.tokenize.punkt import PunktTokenizer
+
+# With CDAC_NLTK_OFFLINE=1 nothing is ever downloaded; missing data raises LookupError instead
+OFFLINE = os.environ.get("CDAC_NLTK_OFFLINE", "").lower() in ("1", "true", "yes")
+
+# Where missing NLTK data is downloaded to (one of NLTK's default search paths)
+NLTK_DATA_PATH = os.path.join(os.path.expanduser("~"), "nltk_data")
+
+# NLTK packages the analyses use, and the path nltk.data.find looks them up by
+NLTK_RESOURCES = {
+    "punkt_tab": "tokenizers/punkt_tab/english/",
+    "averaged_perceptron_tagger_eng": "taggers/averaged_perceptron_tagger_eng/",
+    "wordnet": "corpora/wordnet",
+    "stopwords": "corpora/stopwords",
+}
+
+
+# Function to make sure an NLTK package is on disk, checking the disk only once per process
+@functools.lru_cache(maxsize=None)
+def ensure_resource(name):
+    try:
+        nltk.data.find(NLTK_RESOURCES[name])
+        return
+    except LookupError:
+        if OFFLINE:
+            raise LookupError(
+                f"NLTK resource '{name}' is not installed and offline mode is on. "
+                f"Install it with: python -m nltk.downloader -d {NLTK_DATA_PATH} {name}"
+            )
+    nltk.download(name, download_dir=NLTK_DATA_PATH, quiet=True)
+    # Raises LookupError if the download did not succeed
+    nltk.data.find(NLTK_RESOURCES[name])
+
+
+# The models below are loaded on first use and then shared by the whole process
+
+@functools.lru_cache(maxsize=None)
+def get_sentence_tokenizer(language="english"):
+    ensure_resource("punkt_tab")
+    return PunktTokenizer(language)
+
+
+@functools.lru_cache(maxsize=None)
+def get_tagger():
+    ensure_resource("averaged_perceptron_tagger_eng")
+    return PerceptronTagger()
+
+
+@functools.lru_cache(maxsize=None)
+def get_lemmatizer():
+    ensure_resource("wordnet")
+    return WordNetLemmatizer()
+
+
+@functools.lru_cache(maxsize=None)
+def get_stemmer():
+    return PorterStemmer()
+
+
+@functools.lru_cache(maxsize=None)
+def get_stopwords(language="english"):
+    ensure_resource("stopwords")
+    return frozenset(stopwords.words(language))
@@ -0,0 +1,100 @@
+import hashlib
+import sys
+import threading
+import zlib
+from itertools import islice
+import numpy as np
+from cachetools import LRUCache
+
+# Average number of sentences per segment
+SEGMENT_SENTENCES = 64
+
+# Bounds on a segment's length, so segments are neither tiny nor unbounded
+MIN_SEGMENT_SENTENCES = SEGMENT_SENTENCES // 4
+MAX_SEGMENT_SENTENCES = 4 * SEGMENT_SENTENCES
+
+# Segments whose missing results are computed together, e.g. tagged in one pass over the process pool
+SEGMENT_BATCH = 64
+
+# Bytes of per-segment results kept in each process, shared by every document and Streamlit session
+SEGMENT_CACHE_BYTES = 64 * 1024 * 1024
+
+
+# Function to estimate the memory held by a segment result: arrays, strings, and lists, tuples
+# and dicts of them. An object is counted once per result (e.g. a POS tag repeated in a list), but
+# strings shared between results (interned word types) are counted in each, so this errs on the high side.
+def result_size(value, seen=None):
+    if seen is None:
+        seen = set()
+    if id(value) in seen:
+        return 0
+    seen.add(id(value))
+    if isinstance(value, np.ndarray):
+        return sys.getsizeof(value) + (0 if value.base is None else value.nbytes)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(result_size(item, seen) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(
+            result_size(key, seen) + result_size(item, seen) for key, item in value.items()
+        )
+    return sys.getsizeof(value)
+
+
+_segment_cache = LRUCache(maxsize=SEGMENT_CACHE_BYTES, getsizeof=result_size)
+_segment_cache_lock = threading.Lock()
+
+
+# Raised by per_segment() when it is cancelled between two batches
+class Cancelled(Exception):
+    pass
+
+
+# Function to group a stream of sentences into content-hashed segments, as (digest, sentences) pairs.
+# A segment ends after a sentence whose own hash picks it as a boundary, so segments depend on
+# their content rather than their position: an edit or an appended tail only changes the segments it touches.
+def segment_sentences(sentences):
+    segment = []
+    digest = hashlib.sha256()
+    for sentence in sentences:
+        data = sentence.encode("utf-8")
+        digest.update(len(data).to_bytes(8, "little"))
+        digest.update(data)
+        segment.append(sentence)
+        if len(segment) >= MAX_SEGMENT_SENTENCES or (
+            len(segment) >= MIN_SEGMENT_SENTENCES and zlib.crc32(data) % SEGMENT_SENTENCES == 0
+        ):
+            yield digest.hexdigest(), segment
+            segment = []
+            digest = hashlib.sha256()
+    if segment:
+        yield digest.hexdigest(), segment
+
+
+# Function to yield one result per segment, in order, taking cached results where they exist.
+# `compute` gets a list of (digest, sentences) pairs and returns their results in the same order.
+# Setting the `cancel` event stops the work before the next batch; `progress` is called after each
+# batch with the number of sentences done so far. Batches already computed stay cached.
+def per_segment(name, segments, compute, cancel=None, progress=None):
+    segments = iter(segments)
+    done = 0
+    while batch := list(islice(segments, SEGMENT_BATCH)):
+        if cancel is not None and cancel.is_set():
+            raise Cancelled()
+        with _segment_cache_lock:
+            results = [_segment_cache.get((name, digest)) for digest, _ in batch]
+        missing = [i for i, result in enumerate(results) if result is None]
+        if missing:
+            # Computed outside the lock; two documents sharing a new segment may compute it twice at worst
+            computed = compute([batch[i] for i in missing])
+            with _segment_cache_lock:
+                for i, result in zip(missing, computed):
+                    results[i] = result
+                    try:
+                        _segment_cache[(name, batch[i][0])] = result
+                    except ValueError:
+                        # A result larger than the whole cache is used but not kept
+                        pass
+        yield from results
+        done += sum(len(sentences) for _, sentences in batch)
+        if progress is not None:
+            progress(done)
@@ -0,0 +1,230 @@
+import bisect
+import re
+import threading
+from cachetools import LRUCache
+import numpy as np
+import pandas as pd
+from textblob.en import sentiment as pattern_sentiment
+from textblob._text import (
+    ABBREVIATIONS, EMOTICONS, EOS, PUNCTUATION, RE_ABBR1, RE_ABBR2, RE_ABBR3,
+    RE_EMOTICONS, RE_SARCASM, TOKEN, replacements,
+)
+
+# Placed between sentences so they can be tokenized in one pass and split apart again.
+# It is a plain lowercase word bounded by "q", which no emoticon contains, so none of
+# the tokenizer's rules can join it to its neighbours.
+SENTENCE_SEPARATOR = "qqsentencebreakqq"
+
+# Per-word features, in the order used by _word_features()
+(KNOWN, POLARITY, INTENSITY, MODIFIER, NEGATION, LONGER_THAN_1,
+ LONGER_THAN_2, ENDS_WITH_LY, EXCLAMATION, IRONY, EMOTICON) = range(11)
+
+# Upper bound on the memo of how whitespace-separated tokens split into words
+TOKEN_MEMO_SIZE = 500_000
+
+# Number of words whose features are remembered; the least recently used are dropped beyond it
+FEATURE_MEMO_SIZE = 500_000
+
+_features = LRUCache(maxsize=FEATURE_MEMO_SIZE)
+_features_lock = threading.Lock()
+_lexicon_loaded = False
+_token_parts = {}
+
+# Periods are handled separately from the other punctuation marks
+_PUNCTUATION = tuple(PUNCTUATION.replace(".", ""))
+
+
+# Function to compile what the pattern sentiment rules need to know about one word
+def _word_features(word):
+    lexicon = pattern_sentiment
+    scores = dict.get(lexicon, word)
+    emoticon = np.nan
+    if word.isalpha() is False and len(word) <= 5 and word not in PUNCTUATION:
+        for (_type, p), e in EMOTICONS.items():
+            if word in map(lambda e: e.lower(), e):
+                emoticon = p
+                break
+    return (
+        scores is not None,
+        scores[None][0] if scores is not None else 0.0,
+        scores[None][2] if scores is not None else 1.0,
+        scores is not None and any(map(scores.__contains__, lexicon.modifiers)),
+        word in lexicon.negations,
+        len(word.strip("'")) > 1,
+        len(word) > 2,
+        lexicon.modifier(word),
+        word == "!",
+        word == "(!)",
+        emoticon,
+    )
+
+
+# Function to look up the features of a vocabulary, compiling only words not seen before
+def _feature_table(vocabulary):
+    global _lexicon_loaded
+    with _features_lock:
+        if not _lexicon_loaded:
+            # Touching the lexicon makes it load its XML file
+            len(pattern_sentiment)
+            _lexicon_loaded = True
+        rows = []
+        for word in vocabulary:
+            # Taken as it is looked up, as a vocabulary larger than the memo evicts its own first words
+            row = _features.get(word)
+            if row is None:
+                row = _features[word] = _word_features(word)
+            rows.append(row)
+    return np.array(rows, dtype=float).reshape(len(rows), 11)
+
+
+# Function to split punctuation off one whitespace-separated token.
+# Same rules as the token loop of textblob's find_tokens().
+def _split_token(t):
+    tokens, tail = [], []
+    while t.startswith(_PUNCTUATION) and t not in replacements:
+        tokens.append(t[0])
+        t = t[1:]
+    while t.endswith(_PUNCTUATION + (".",)) and t not in replacements:
+        if t.endswith(_PUNCTUATION):
+            tail.append(t[-1])
+            t = t[:-1]
+        if t.endswith("..."):
+            tail.append("...")
+            t = t[:-3].rstrip(".")
+        if t.endswith("."):
+            if (
+                t in ABBREVIATIONS
+                or RE_ABBR1.match(t) is not None
+                or RE_ABBR2.match(t) is not None
+                or RE_ABBR3.match(t) is not None
+            ):
+                break
+            tail.append(t[-1])
+            t = t[:-1]
+    if t != "":
+        tokens.append(t)
+    tokens.extend(reversed(tail))
+    return tokens
+
+
+# Function to tokenize a whole text the way textblob's find_tokens() does, as one flat list.
+# Sentence grouping is skipped: it only drops END-OF-SENTENCE markers, which are filtered here.
+def _find_tokens(string):
+    for a, b in replacements.items():
+        string = re.sub(a, b, string)
+    string = (
+        string.replace("“", " “ ").replace("”", " ” ").replace("‘", " ‘ ")
+        .replace("’", " ’ ").replace("'", " ' ").replace('"', ' " ')
+    )
+    string = re.sub("\r\n", "\n", string)
+    string = re.sub(r"\n{2,}", " %s " % EOS, string)
+    string = re.sub(r"\s+", " ", string)
+    tokens = []
+    for t in TOKEN.findall(string + " "):
+        parts = _token_parts.get(t)
+        if parts is None:
+            parts = _split_token(t)
+            if len(_token_parts) < TOKEN_MEMO_SIZE:
+                _token_parts[t] = parts
+        tokens.extend(parts)
+    return [t for t in tokens if t != EOS]
+
+
+# Function to turn sentences into lowercase words, grouped by sentence
+def _tokenize(sentences):
+    if not sentences:
+        return []
+    if any(SENTENCE_SEPARATOR in sentence.lower() for sentence in sentences):
+        # The separator occurs in the text itself; tokenize sentence by sentence instead
+        return [" ".join(pattern_sentiment.tokenizer(s)).lower().split() for s in sentences]
+
+    tokens = " ".join(_find_tokens(f" {SENTENCE_SEPARATOR} ".join(sentences)))
+    separators = [m.start() for m in re.finditer(SENTENCE_SEPARATOR, tokens)]
+    grouped = [words.split() for words in tokens.lower().split(SENTENCE_SEPARATOR)]
+
+    # Sarcasm marks and emoticons are rewritten across neighbouring tokens, within
+    # textblob's own sentences; the few sentences containing one are tokenized exactly
+    for pattern in (RE_SARCASM, RE_EMOTICONS):
+        for match in pattern.finditer(tokens):
+            index = bisect.bisect(separators, match.start())
+            grouped[index] = " ".join(pattern_sentiment.tokenizer(sentences[index])).lower().split()
+    return grouped
+
+
+# Function to score the polarity of many sentences at once.
+# Gives the same values as TextBlob(sentence).sentiment.polarity for each sentence.
+def score_sentences(sentences):
+    sentences = list(sentences)
+    grouped = _tokenize(sentences)
+    words = [word for sentence in grouped for word in sentence]
+    sentence_ids = np.repeat(np.arange(len(grouped)), [len(sentence) for sentence in grouped]).tolist()
+
+    # Intern the words and gather their features through the inverse index
+    ids, vocabulary = pd.factorize(np.array(words, dtype=object))
+    features = _feature_table(vocabulary.tolist())[ids]
+    known, modifier, negation, longer_1, longer_2, ends_ly, bang, irony = (
+        features[:, column].astype(bool).tolist()
+        for column in (KNOWN, MODIFIER, NEGATION, LONGER_THAN_1, LONGER_THAN_2, ENDS_WITH_LY, EXCLAMATION, IRONY)
+    )
+    polarity, intensity, emoticon = (
+        features[:, column].tolist() for column in (POLARITY, INTENSITY, EMOTICON)
+    )
+    has_emoticon = (~np.isnan(features[:, EMOTICON])).tolist()
+
+    # pattern's assessment rules are sequential within a sentence, so they run as one
+    # tight loop over the precomputed feature columns
+    scored_ids, scores = [], []
+    assessments = []
+    current = -1
+    m = n = None
+    for position, sentence in enumerate(sentence_ids):
+        if sentence != current:
+            for p, _, negated in assessments:
+                scored_ids.append(current)
+                scores.append(p * -0.5 if negated else p)
+            assessments = []
+            current = sentence
+            m = n = None
+        if known[position]:
+            p, i = polarity[position], intensity[position]
+            if m is None:
+                assessments.append([p, i, False])
+            else:
+                last = assessments[-1]
+                last[0] = max(-1.0, min(p * last[1], +1.0))
+                last[1] = i
+            if n is not None:
+                assessments[-1][1] = 1.0 / assessments[-1][1]
+                assessments[-1][2] = True
+            m = position if modifier[position] else None
+            n = position if negation[position] else None
+        else:
+            if negation[position]:
+                n = position
+            elif n is not None and longer_1[position]:
+                n = None
+            if n is not None and m is not None and ends_ly[m]:
+                assessments[-1][2] = True
+                n = None
+            elif m is not None and longer_2[position]:
+                m = None
+            if bang[position] and assessments:
+                assessments[-1][0] = max(-1.0, min(assessments[-1][0] * 1.25, +1.0))
+            if irony[position]:
+                assessments.append([0.0, 1.0, False])
+            if has_emoticon[position]:
+                assessments.append([emoticon[position], 1.0, False])
+    for p, _, negated in assessments:
+        scored_ids.append(current)
+        scores.append(p * -0.5 if negated else p)
+
+    # Average the assessments of each sentence; sentences without any score 0.0
+    scored_ids = np.asarray(scored_ids, dtype=np.int64)
+    totals = np.bincount(scored_ids, weights=scores, minlength=len(sentences))
+    counts = np.bincount(scored_ids, minlength=len(sentences))
+    return totals / np.maximum(counts, 1)
+
+
+# Function to label polarity scores the way the app reports them
+def label_polarity(polarity):
+    return np.where(polarity > 0, "Positive", np.where(polarity < 0, "Negative", "Neutral"))
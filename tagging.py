@@ -0,0 +1,21 @@
+from pool import MAX_WORKERS, pool_map, split_batches
+from resources import get_tagger
+
+
+def _tag_batch(sentences):
+    # get_tagger() loads the perceptron tagger once per process
+    tagger = get_tagger()
+    return [tagger.tag(tokens) for tokens in sentences]
+
+
+# Function to POS tag tokenized sentences, optionally across the shared process pool
+def tag_sentences(sentence_tokens, workers=1):
+    # Sentences are tagged independently, so the serial and parallel paths give the same tags
+    workers = max(1, min(workers, MAX_WORKERS))
+    if workers == 1 or len(sentence_tokens) < workers:
+        return [pair for tagged in _tag_batch(sentence_tokens) for pair in tagged]
+
+    # Each worker loads the tagger on its first batch and keeps it;
+    # pool_map() returns the batches in submission order
+    results = pool_map(_tag_batch, split_batches(sentence_tokens, workers), workers=workers)
+    return [pair for batch in results for tagged in batch for pair in tagged]
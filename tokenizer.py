@@ -0,0 +1,115 @@
+import os
+import re
+from itertools import repeat
+from nltk.tokenize import NLTKWordTokenizer, word_tokenize
+from pool import MAX_WORKERS, pool_map, split_batches
+
+# Word tokenizer engines: "treebank" is NLTK's word_tokenize, "fast" gives the same tokens in one regex pass
+TOKENIZERS = ("fast", "treebank")
+
+# Engine used when an analysis does not choose one; set CDAC_TOKENIZER=treebank to always use NLTK's
+DEFAULT_TOKENIZER = os.environ.get("CDAC_TOKENIZER", "fast")
+
+# Characters NLTK's Treebank rules always split off as tokens of their own
+_SINGLE = "\\[\\](){}<>;@#$%&?!*‒-―«“‘„»”’"
+
+# Characters allowed after a period for it to be split off as the sentence's final period
+# (closing double quotes have become '' by then)
+_CLOSERS = "\\])}>»”’'"
+
+# The tokens of a sentence in one pass: the Treebank rules come down to splitting off
+# punctuation and gluing everything else, once the cases below are ruled out
+_TOKEN = re.compile(
+    r"``|''|\.{2,}"
+    rf"|\.(?=[{_CLOSERS} ]*\s*$)"
+    r"|--"
+    rf"|[{_SINGLE}]"
+    r"|[:,](?!\d)"
+    rf"|(?:[^\s.:,'`\-{_SINGLE}]|'(?=\w)|[:,](?=\d)|-(?!-)|\.(?!\.|[{_CLOSERS} ]*\s*$))+"
+)
+
+# Sentences that need rules the single pass does not cover: backticks, apostrophes that are not
+# inside a word, and runs of double quotes, commas or colons. They are rare in reviews and are
+# handed to word_tokenize as they are.
+_TREEBANK_ONLY = re.compile(r"`|(?<!\w)'|'(?!\w)|\"\"|[:,][:,]")
+
+# A double quote opens a quotation at the start of the sentence or after a space or an opening bracket
+_OPENING_QUOTE = re.compile(r'(?:^|(?<=[ (\[{<«“‘„]))"')
+
+# Clitics split off the end of a word, in the order the Treebank rules apply them
+_CLITIC_1 = re.compile(r"(?<=[^' ])('[sSmMdD])$")
+_CLITIC_2 = re.compile(r"(?<=[^' ])('ll|'LL|'re|'RE|'ve|'VE|n't|N'T)$")
+
+# Words NLTK splits in two, e.g. "cannot" into "can" and "not"
+_CONTRACTIONS = NLTKWordTokenizer.CONTRACTIONS2
+_CONTRACTION_WORDS = re.compile(r"(?i)cannot|d'ye|gimme|gonna|gotta|lemme|more'n|wanna")
+
+
+def _split_token(token):
+    tail = []
+    for clitic in (_CLITIC_1, _CLITIC_2):
+        match = clitic.search(token)
+        if match:
+            tail.insert(0, match.group())
+            token = token[:match.start()]
+    tokens = [token] + tail
+    if not _CONTRACTION_WORDS.search(token):
+        return tokens
+    split = []
+    for token in tokens:
+        # A token ends with a space in NLTK's padded text, which "wanna" looks for
+        token += " "
+        for regexp in _CONTRACTIONS:
+            token = regexp.sub(r" \1 \2 ", token)
+        split.extend(token.split())
+    return split
+
+
+# Function to tokenize a sentence exactly as word_tokenize(sentence, preserve_line=True) does
+def fast_word_tokenize(sentence):
+    if _TREEBANK_ONLY.search(sentence):
+        return word_tokenize(sentence, preserve_line=True)
+    if '"' in sentence:
+        sentence = _OPENING_QUOTE.sub("``", sentence).replace('"', "''")
+    tokens = _TOKEN.findall(sentence)
+    apostrophe = "'" in sentence
+    # Every contraction has an apostrophe or a doubled n, m or t, which is cheaper to look for first
+    lowered = sentence.lower()
+    contraction = (apostrophe or "nn" in lowered or "mm" in lowered or "tt" in lowered) \
+        and _CONTRACTION_WORDS.search(sentence) is not None
+    if not apostrophe and not contraction:
+        return tokens
+    split = []
+    for token in tokens:
+        if "'" in token or (contraction and _CONTRACTION_WORDS.search(token)):
+            split.extend(_split_token(token))
+        else:
+            split.append(token)
+    return split
+
+
+def _treebank_word_tokenize(sentence):
+    return word_tokenize(sentence, preserve_line=True)
+
+
+# Function to get the function tokenizing one sentence for an engine
+def get_word_tokenizer(engine=DEFAULT_TOKENIZER):
+    if engine == "fast":
+        return fast_word_tokenize
+    if engine == "treebank":
+        return _treebank_word_tokenize
+    raise ValueError(f"Unknown tokenizer {engine!r}, expected one of {', '.join(TOKENIZERS)}")
+
+
+def _tokenize_batch(sentences, engine):
+    tokenize = get_word_tokenizer(engine)
+    return [tokenize(sentence) for sentence in sentences]
+
+
+# Function to tokenize sentences, one token list per sentence, optionally across the shared process pool
+def tokenize_sentences(sentences, engine=DEFAULT_TOKENIZER, workers=1):
+    workers = max(1, min(workers, MAX_WORKERS))
+    if workers == 1 or len(sentences) < workers:
+        return _tokenize_batch(sentences, engine)
+    results = pool_map(_tokenize_batch, split_batches(sentences, workers), repeat(engine), workers=workers)
+    return [tokens for batch in results for tokens in batch]
@@ -0,0 +1,97 @@
+import time
+import streamlit as st
+from instrument import span
+
+# Rows (or paragraphs) per page offered to the user
+PAGE_SIZES = [25, 50, 100, 250, 500]
+
+# Seconds between progress updates of a running background job
+JOB_POLL_SECONDS = 0.5
+
+
+# Function to show page size and page number controls and return the slice bounds of the current page
+def _page_controls(total, key):
+    size_col, page_col, info_col = st.columns([1, 1, 2])
+    with size_col:
+        page_size = st.selectbox("Rows per page", PAGE_SIZES, key=f"{key}_page_size")
+    pages = max(1, -(-total // page_size))
+    # Keep the remembered page in range when a filter or page size shrinks the result
+    if st.session_state.get(f"{key}_page", 1) > pages:
+        st.session_state[f"{key}_page"] = pages
+    with page_col:
+        page = st.number_input("Page", min_value=1, max_value=pages, step=1, key=f"{key}_page")
+    start = (page - 1) * page_size
+    end = min(start + page_size, total)
+    with info_col:
+        st.caption(f"Showing {start + 1 if total else 0}-{end} of {total:,} (page {page} of {pages:,})")
+    return start, end
+
+
+# Function to keep the rows of a DataFrame that contain the search text in any text column
+def filter_rows(df, search):
+    if not search:
+        return df
+    import pandas as pd
+    mask = pd.Series(False, index=df.index)
+    for column in df.columns:
+        if df[column].dtype == object or isinstance(df[column].dtype, (pd.CategoricalDtype, pd.StringDtype)):
+            mask |= df[column].astype("string").str.contains(search, case=False, regex=False, na=False)
+    return df[mask]
+
+
+# Function to show a large DataFrame one page at a time.
+# Only the visible page is sent to the browser.
+def show_paged_table(df, key):
+    search = st.text_input("Search", key=f"{key}_search", placeholder="Filter rows containing...")
+    with span("viewer.filter", rows=len(df)):
+        filtered = filter_rows(df, search)
+
+    # Summary stats are computed on the server, over the whole result
+    stats = st.columns(3)
+    stats[0].metric("Rows", f"{len(df):,}")
+    stats[1].metric("Matching rows", f"{len(filtered):,}")
+    first = df.columns[0] if len(df.columns) else None
+    if first is not None:
+        stats[2].metric(f"Distinct {first}", f"{df[first].nunique():,}")
+
+    start, end = _page_controls(len(filtered), key)
+    with span("viewer.page", rows=end - start):
+        st.dataframe(filtered.iloc[start:end], use_container_width=True)
+
+
+# Function to show a long list of paragraphs one page at a time
+def show_paged_text(paragraphs, key):
+    search = st.text_input("Search", key=f"{key}_search", placeholder="Filter paragraphs containing...")
+    if search:
+        needle = search.lower()
+        paragraphs = [para for para in paragraphs if needle in para.lower()]
+    start, end = _page_controls(len(paragraphs), key)
+    for para in paragraphs[start:end]:
+        st.write(para)
+
+
+# Function to show the progress of a background job with a cancel button.
+# Returns True once the job has finished successfully; while it runs the page polls for progress.
+def show_job(job, key, poll_seconds=JOB_POLL_SECONDS):
+    from jobs import CANCELLED, DONE, FAILED
+    if job.status == DONE:
+        st.caption(f"{job.name} computed in {job.elapsed:.1f}s")
+        return True
+    if job.status in (FAILED, CANCELLED):
+        if job.status == FAILED:
+            st.error(f"{job.name} failed: {job.message}")
+        else:
+            st.warning(f"{job.name} was cancelled.")
+        # The job stays as it is until it is started again explicitly
+        if st.button("Run again", key=f"{key}_run_again"):
+            st.session_state[f"{key}_restart"] = True
+            st.rerun()
+        return False
+
+    st.progress(job.progress, text=f"{job.name}: {job.message} - {job.elapsed:.0f}s")
+    if st.button("Cancel", key=f"{key}_cancel"):
+        job.cancel()
+        st.rerun()
+    # The work goes on in the background; the page is rerun to show its progress
+    time.sleep(poll_seconds)
+    st.rerun()